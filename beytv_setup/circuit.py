@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+BeyTV Circuit Breaker - fail fast while a backend is unreachable
+After a few consecutive network failures the circuit opens: calls are
+rejected immediately and a background thread probes the backend with
+exponential backoff until it answers again
+"""
+
+import time
+import threading
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that is known to be down"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a background recovery probe"""
+
+    def __init__(self, name, probe, failure_threshold=2, base_delay=1.0, max_delay=60.0):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.next_probe_at = None
+        self.last_error = ''
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError when open; a plain attribute check otherwise"""
+        if self.state == OPEN:
+            raise CircuitOpenError(f"{self.name} offline: {self.last_error}")
+
+    def record_success(self):
+        if self.failures:
+            with self.lock:
+                self.failures = 0
+
+    def record_failure(self, error):
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == OPEN or self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self.opened_at = time.time()
+        print(f"⚠️ {self.name} unreachable, failing fast until it recovers")
+        threading.Thread(target=self._probe_loop, name=f'{self.name}-probe', daemon=True).start()
+
+    def _probe_loop(self):
+        delay = self.base_delay
+        while True:
+            self.next_probe_at = time.time() + delay
+            time.sleep(delay)
+            try:
+                self.probe()
+            except Exception as e:
+                self.last_error = str(e)
+                delay = min(delay * 2, self.max_delay)
+                continue
+            with self.lock:
+                self.state = CLOSED
+                self.failures = 0
+                self.opened_at = None
+                self.next_probe_at = None
+            print(f"✅ {self.name} reachable again")
+            return
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'offline_since': self.opened_at,
+            'next_probe_in': round(max(self.next_probe_at - time.time(), 0), 1) if self.next_probe_at else None,
+            'last_error': self.last_error,
+        }
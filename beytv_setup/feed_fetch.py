@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+BeyTV Feed Fetcher - conditional RSS downloads
+Each feed's ETag and Last-Modified are remembered between runs, so an
+unchanged feed costs one 304 round trip instead of a download and parse
+"""
+
+import os
+import time
+import sqlite3
+
+import requests
+
+from item_store import DEFAULT_DB
+
+FEED_WORKERS = int(os.environ.get('FEED_WORKERS', '4'))
+FEED_TIMEOUT = float(os.environ.get('FEED_TIMEOUT', '20'))
+USER_AGENT = 'BeyTV/1.0 (+feed fetcher)'
+
+
+class FeedFetcher:
+    """Fetches feeds with If-None-Match / If-Modified-Since"""
+
+    def __init__(self, path=DEFAULT_DB, timeout=FEED_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.init_database()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def init_database(self):
+        conn = self.connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS feed_http_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                checked_at INTEGER
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def validators(self, url):
+        conn = self.connect()
+        try:
+            row = conn.execute('SELECT etag, last_modified FROM feed_http_state WHERE url = ?', (url,)).fetchone()
+        finally:
+            conn.close()
+        return row or (None, None)
+
+    def remember(self, url, etag, last_modified):
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO feed_http_state VALUES (?, ?, ?, ?)',
+                             (url, etag, last_modified, int(time.time())))
+        finally:
+            conn.close()
+
+    def fetch(self, url):
+        """Return the feed body as bytes, or None when unchanged since the last fetch"""
+        if not url.startswith(('http://', 'https://')):
+            with open(url, 'rb') as f:  # local file, e.g. a recorded feed
+                return f.read()
+        etag, last_modified = self.validators(url)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        r = self.session.get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return None
+        r.raise_for_status()
+        self.remember(url, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+        return r.content
+
+    def forget(self, url):
+        """Drop stored validators so the next fetch downloads the feed again"""
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM feed_http_state WHERE url = ?', (url,))
+        finally:
+            conn.close()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+BeyTV Feed Items - normalized RSS/torrent records
+Shared parsing helpers so every feed entry is normalized exactly once
+"""
+
+import re
+import html
+import base64
+import calendar
+from collections import namedtuple
+from email.utils import parsedate_tz, mktime_tz
+
+# Patterns are compiled once at import instead of on every entry
+MAGNET_RE = re.compile(r'magnet:\?[^"<>\s]+')
+BTIH_RE = re.compile(r'xt=urn:btih:([0-9a-fA-F]{40}|[A-Za-z2-7]{32})')
+SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMGT])i?B\b', re.IGNORECASE)
+XL_RE = re.compile(r'[?&]xl=(\d+)')
+SEEDERS_RE = re.compile(r'(?:Seeds|Seeders)\s*:?\s*(\d+)', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+SPACE_RE = re.compile(r'\s+')
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+_FIELDS = ['title', 'link', 'magnet', 'infohash', 'size', 'published',
+           'seeders', 'source', 'description']
+
+
+class FeedItem(namedtuple('FeedItem', _FIELDS)):
+    """Compact feed record: size in bytes, published as a UTC epoch"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """JSON-friendly view used by the dashboard API"""
+        data = self._asdict()
+        data['size_label'] = format_size(self.size)
+        return data
+
+
+def format_size(num_bytes):
+    """Human readable size, e.g. 1503238554 -> '1.4 GB'"""
+    if not num_bytes:
+        return "Unknown"
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def parse_size(text):
+    """Parse '1.4 GB' / 'Size: 700 MiB' into bytes (0 when unknown)"""
+    if not text:
+        return 0
+    match = SIZE_RE.search(text)
+    if not match:
+        return 0
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_magnet_size(magnet):
+    """Exact length from a magnet's xl= parameter (0 when absent)"""
+    match = XL_RE.search(magnet or '')
+    return int(match.group(1)) if match else 0
+
+
+def parse_infohash(magnet):
+    """Return the lowercase hex btih of a magnet link, or '' if absent"""
+    if not magnet:
+        return ''
+    match = BTIH_RE.search(magnet)
+    if not match:
+        return ''
+    value = match.group(1)
+    if len(value) == 32:
+        # Base32 encoded infohash (older magnet style)
+        try:
+            return base64.b32decode(value.upper()).hex()
+        except ValueError:
+            return ''
+    return value.lower()
+
+
+def parse_published(entry):
+    """Return entry publish time as a UTC epoch (0 when unknown)"""
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    if parsed:
+        return calendar.timegm(parsed)
+    raw = entry.get('published') or entry.get('updated') or ''
+    parts = parsedate_tz(raw) if raw else None
+    if parts:
+        return mktime_tz(parts)
+    return 0
+
+
+def plain_text(text):
+    """Descriptions are shown in the dashboard: keep text only. Tags become spaces
+    so 'Size: 1 GB<br>Runtime' does not run together"""
+    return SPACE_RE.sub(' ', TAG_RE.sub(' ', text or '')).replace('<', '&lt;').strip()
+
+
+def extract_magnet(entry):
+    """Extract magnet link from RSS entry, falling back to the entry link"""
+    for enclosure in entry.get('enclosures') or []:
+        href = enclosure.get('href') or enclosure.get('url') or ''
+        if href.startswith('magnet:'):
+            return href
+
+    # ezrss <torrent:magnetURI>
+    if (entry.get('torrent_magneturi') or '').startswith('magnet:'):
+        return entry['torrent_magneturi']
+
+    description = entry.get('description', '')
+    if 'magnet:' in description:
+        match = MAGNET_RE.search(description)
+        if match:
+            return html.unescape(match.group(0))  # &amp; from an <a href>
+
+    return entry.get('link', '')
+
+
+def extract_size(entry):
+    """Extract size in bytes from enclosure length, torrent tags or description"""
+    for enclosure in entry.get('enclosures') or []:
+        try:
+            length = int(enclosure.get('length') or 0)
+        except (TypeError, ValueError):
+            length = 0
+        if length > 0:
+            return length
+
+    try:
+        length = int(entry.get('torrent_contentlength') or 0)
+    except (TypeError, ValueError):
+        length = 0
+    if length > 0:
+        return length
+
+    return parse_size(entry.get('description', ''))
+
+
+def extract_seeders(entry):
+    """Extract seeder count from torrent tags or description"""
+    try:
+        seeds = int(entry.get('torrent_seeds') or 0)
+    except (TypeError, ValueError):
+        seeds = 0
+    if seeds:
+        return seeds
+    match = SEEDERS_RE.search(entry.get('description', ''))
+    return int(match.group(1)) if match else 0
+
+
+def normalize_entry(entry, source):
+    """Turn a feedparser entry into a FeedItem"""
+    magnet = extract_magnet(entry)
+    infohash = entry.get('torrent_infohash', '') or parse_infohash(magnet)
+    return FeedItem(
+        title=entry.get('title', 'Unknown'),
+        link=entry.get('link', ''),
+        magnet=magnet,
+        infohash=infohash.lower(),
+        size=extract_size(entry) or parse_magnet_size(magnet),
+        published=parse_published(entry),
+        seeders=extract_seeders(entry),
+        source=source,
+        description=plain_text(entry.get('description', '')),
+    )
+
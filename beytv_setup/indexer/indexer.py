@@ -1,16 +1,36 @@
-import os, time, json, requests, feedparser
+import os, sys, time, json, html, argparse, requests
 from pathlib import Path
 from urllib.parse import quote
 from dotenv import load_dotenv
 
+# Before the shared modules are imported: they read their settings at import time
 load_dotenv()
 
+# Shared BeyTV modules live one directory up, storage placement in the router pack
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "router"))
+from item_store import ItemStore
+from feed_fetch import FeedFetcher
+from ingest import FeedIngest
+from qbt_scheduler import get_scheduler, PRIORITY_BACKGROUND
+from item_log import ItemLog
+from placement import placement_path
+
 QB_URL = os.getenv("QB_URL", "http://localhost:8080")
 QB_USER = os.getenv("QB_USER", "admin")
 QB_PASS = os.getenv("QB_PASS", "adminadmin")
 FEEDS = [f.strip() for f in os.getenv("FEEDS","https://yts.mx/rss").split(",") if f.strip()]
 CATEGORY = os.getenv("CATEGORY", "auto")
 LIMIT = int(os.getenv("LIMIT", "30"))
+ITEM_LOG_DIR = os.getenv("ITEM_LOG_DIR", "feeds/log")
+LOG_SEGMENT_MB = float(os.getenv("LOG_SEGMENT_MB", "8"))
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+LOG_FIELDS = ("title", "link", "magnet", "infohash", "size", "published", "seeders", "source")
+
+PAGE_HTML = """<!doctype html><html><head><meta charset='utf-8'><title>BeyTV Indexer</title>
+    <style>body{{font-family:sans-serif;max-width:900px;margin:auto}}table{{width:100%;border-collapse:collapse}}td,th{{border:1px solid #ddd;padding:6px}}</style></head>
+    <body><h1>BeyTV Indexer</h1><p>{nav}</p><table><tr><th>Title</th><th>Magnet</th><th>Source</th></tr>
+"""
 
 def qb_login(session):
     url = f"{QB_URL}/api/v2/auth/login"
@@ -20,53 +40,123 @@ def qb_login(session):
     print("Login failed")
     return False
 
-def qb_add(session, magnet):
+def qb_add(session, magnet, save_path=None):
     url = f"{QB_URL}/api/v2/torrents/add"
     data = {"urls": magnet, "category": CATEGORY}
-    session.post(url, data=data, timeout=15)
-
-def fetch_feeds():
-    all_items = []
-    for f in FEEDS:
-        print(f"Fetching {f}")
-        d = feedparser.parse(f)
-        for e in d.entries[:LIMIT]:
-            title = e.get("title", "unknown")
-            link = e.get("link", "")
-            if "magnet:?" in link:
-                magnet = link
-            else:
-                # fallback for rss with magnet link in enclosure
-                magnet = e.get("enclosures", [{}])[0].get("url", "")
-            if not magnet.startswith("magnet:"):
-                continue
-            all_items.append({"title": title, "magnet": magnet, "source": f})
-    return all_items
+    if save_path:
+        data["savepath"] = save_path
+    # Background work: rate limited and yields to anything more urgent
+    r = get_scheduler(QB_URL).call(lambda: session.post(url, data=data, timeout=15), PRIORITY_BACKGROUND)
+    return r.status_code == 200 and "Fails" not in r.text
+
+class Pusher:
+    """Push stage: rule matches with a magnet go to qBittorrent; returns the pushed ones"""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.logged_in = None
+
+    def __call__(self, matches):
+        matches = [(rule, item) for rule, item in matches if item.magnet.startswith("magnet:")]
+        if not matches:
+            return []
+        pushed = []
+        try:
+            if self.logged_in is None:
+                self.logged_in = qb_login(self.session)
+            if self.logged_in:
+                for rule, item in matches:
+                    print(f"Rule '{rule.name}' matched: {item.title}")
+                    save_path = placement_path(item.magnet, item.title, item.size, rule.save_path)
+                    if qb_add(self.session, item.magnet, save_path):
+                        pushed.append((rule, item))
+        except Exception as e:
+            print("qB push failed:", e)
+        return pushed
+
+def fetch_feeds(store):
+    """Run every feed through the ingestion pipeline (conditional GET, dedupe, rules, push)"""
+    fetcher = FeedFetcher(store.path)
+    ingest = FeedIngest(fetcher.fetch, store, limit=LIMIT, push=Pusher(), on_parse_error=fetcher.forget)
+    ingest.run([(f, f) for f in FEEDS])
+    for stage, stats in ingest.metrics().items():
+        print(f"  {stage:<9} in={stats['in']} out={stats['out']} errors={stats['errors']} "
+              f"avg={stats['avg_latency_ms']}ms max={stats['max_latency_ms']}ms")
+    # Only items not stored before are new
+    return ingest.new_items
+
+def page_name(page):
+    return f"page-{page:06d}.html"
+
+def write_page(log, outdir, page, pages):
+    """Render one page (items newest first) by streaming its slice of the log"""
+    items = list(log.read((page - 1) * PAGE_SIZE, page * PAGE_SIZE))
+    nav = ["<a href='index.html'>Latest</a>"]
+    if page > 1:
+        nav.append(f"<a href='{page_name(page - 1)}'>Older</a>")
+    if page < pages:
+        nav.append(f"<a href='{page_name(page + 1)}'>Newer</a>")
+    nav.append(f"Page {page}")
+    tmp = outdir / (page_name(page) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(PAGE_HTML.format(nav=" | ".join(nav)))
+        for i in reversed(items):
+            f.write(f"<tr><td>{html.escape(i['title'])}</td><td><a href='{html.escape(i['magnet'], quote=True)}'>Magnet</a></td>"
+                    f"<td>{html.escape(i['source'])}</td></tr>\n")
+        f.write("</table></body></html>\n")
+    os.replace(tmp, outdir / page_name(page))
+
+def render_pages(log, outdir, first_new):
+    """Rewrite only the pages holding items from first_new on, plus index.html"""
+    pages = max(1, -(-log.total // PAGE_SIZE))
+    start = first_new // PAGE_SIZE + 1
+    if first_new % PAGE_SIZE == 0 and start > 1:
+        start -= 1  # the previous tail page gains its "Newer" link
+    for page in range(start, pages + 1):
+        write_page(log, outdir, page, pages)
+    tmp = outdir / "index.html.tmp"
+    tmp.write_bytes((outdir / page_name(pages)).read_bytes())
+    os.replace(tmp, outdir / "index.html")
+    return pages - start + 1
+
+def history(date=None, source=None):
+    """Print logged items as NDJSON, filtered by discovery date and/or source"""
+    for item in ItemLog(ITEM_LOG_DIR).query(date=date, source=source):
+        print(json.dumps(item, ensure_ascii=False))
 
 def main():
-    Path("feeds").mkdir(exist_ok=True)
-    items = fetch_feeds()
-    if not items:
-        print("No items found")
+    outdir = Path("feeds")
+    outdir.mkdir(exist_ok=True)
+    store = ItemStore()
+    new_records = fetch_feeds(store)
+    if not new_records:
+        print("No new items")
         return
-    with open("feeds/latest.json", "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    rows = "\n".join([f"<tr><td>{i['title']}</td><td><a href='{i['magnet']}'>Magnet</a></td><td>{i['source']}</td></tr>" for i in items])
-    html = f"""<!doctype html><html><head><meta charset='utf-8'><title>BeyTV Indexer</title>
-    <style>body{{font-family:sans-serif;max-width:900px;margin:auto}}table{{width:100%;border-collapse:collapse}}td,th{{border:1px solid #ddd;padding:6px}}</style></head>
-    <body><h1>BeyTV Indexer</h1><table><tr><th>Title</th><th>Magnet</th><th>Source</th></tr>{rows}</table></body></html>"""
-    Path("feeds/index.html").write_text(html, encoding="utf-8")
 
-    # Optionally push to qBittorrent
-    try:
-        s = requests.Session()
-        if qb_login(s):
-            for i in items[:5]:  # add top 5
-                qb_add(s, i["magnet"])
-    except Exception as e:
-        print("qB push failed:", e)
+    # Append-only history: oldest first, grouped by source so each run adds one index line per feed
+    log = ItemLog(ITEM_LOG_DIR, segment_bytes=int(LOG_SEGMENT_MB * 1024 * 1024))
+    ordered = sorted(new_records, key=lambda i: (i.source, i.published))
+    first_new = log.append([{k: getattr(i, k) for k in LOG_FIELDS} for i in ordered])
+    rewritten = render_pages(log, outdir, first_new)
+
+    # latest.json stays bounded: the tail of the log only
+    tail = log.read(max(0, log.total - LIMIT * len(FEEDS)))
+    items = [{"title": i["title"], "magnet": i["magnet"], "source": i["source"]}
+             for i in tail if i["magnet"].startswith("magnet:")][::-1]
+    tmp = outdir / "latest.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, outdir / "latest.json")
 
-    print(f"Saved {len(items)} items to feeds/latest.json")
+    print(f"{len(new_records)} new item(s) logged; {log.total} in history, rewrote {rewritten} page(s)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="BeyTV torrent RSS indexer")
+    parser.add_argument("--history", nargs="?", const="", metavar="YYYY-MM-DD",
+                        help="Print logged items (optionally only those discovered on a date)")
+    parser.add_argument("--source", help="With --history: only items from this feed URL")
+    args = parser.parse_args()
+    if args.history is not None:
+        history(args.history or None, args.source)
+    else:
+        main()
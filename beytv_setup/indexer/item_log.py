@@ -0,0 +1,121 @@
+"""
+BeyTV Indexer Item Log - append-only history of discovered items
+Items are appended as NDJSON to size-rotated segment files. A sidecar
+index (also NDJSON, one line per appended run of items from one source)
+records sequence number, date, source, segment and byte offset, so pages
+and date/source queries seek straight to the right place instead of
+reading the whole history
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+
+SEGMENT_BYTES = 8 * 1024 * 1024
+
+
+class ItemLog:
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / "index.ndjson"
+        self.segment_bytes = segment_bytes
+        self.entries = self.load_index()
+        self.recover()
+
+    def load_index(self):
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def segment_path(self, number):
+        return self.dir / f"items-{number:06d}.ndjson"
+
+    def recover(self):
+        """Drop log bytes written by a run that died before indexing them"""
+        last = self.entries[-1] if self.entries else {"segment": 0, "offset": 0, "length": 0}
+        for path in self.dir.glob("items-*.ndjson"):
+            number = int(path.stem.split("-")[1])
+            if number > last["segment"]:
+                path.unlink()
+            elif number == last["segment"] and path.stat().st_size > last["offset"] + last["length"]:
+                os.truncate(path, last["offset"] + last["length"])
+
+    @property
+    def total(self):
+        return self.entries[-1]["seq"] + self.entries[-1]["count"] if self.entries else 0
+
+    def append(self, items, source_of=lambda item: item.get("source", "")):
+        """Append items (dicts) in order; returns the sequence number of the first one"""
+        if not items:
+            return self.total
+        first_seq = self.total
+        segment = self.entries[-1]["segment"] if self.entries else 1
+        path = self.segment_path(segment)
+
+        date = time.strftime("%Y-%m-%d", time.gmtime())
+        new_entries = []
+        seq = first_seq
+        f = open(path, "ab")
+        try:
+            for item in items:
+                if f.tell() >= self.segment_bytes:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+                    segment += 1
+                    f = open(self.segment_path(segment), "ab")
+                line = (json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+                source = source_of(item)
+                last = new_entries[-1] if new_entries else None
+                if last and last["source"] == source and last["segment"] == segment:
+                    last["count"] += 1
+                    last["length"] += len(line)
+                else:
+                    new_entries.append({"seq": seq, "count": 1, "date": date, "source": source,
+                                        "segment": segment, "offset": f.tell(), "length": len(line)})
+                f.write(line)
+                seq += 1
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+        # The index is written last: lines it does not cover are dropped by recover()
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            for entry in new_entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.entries.extend(new_entries)
+        return first_seq
+
+    def _read_entry(self, entry, skip=0):
+        with open(self.segment_path(entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            for i in range(entry["count"]):
+                line = f.readline()
+                if i >= skip:
+                    yield json.loads(line)
+
+    def read(self, start=0, stop=None):
+        """Stream items with sequence numbers in [start, stop)"""
+        stop = self.total if stop is None else min(stop, self.total)
+        for entry in self.entries:
+            if entry["seq"] + entry["count"] <= start:
+                continue
+            if entry["seq"] >= stop:
+                break
+            skip = max(start - entry["seq"], 0)
+            take = min(entry["count"], stop - entry["seq"])
+            for i, item in enumerate(self._read_entry(entry, skip), skip):
+                if i >= take:
+                    break
+                yield item
+
+    def query(self, date=None, source=None):
+        """Stream items discovered on date (YYYY-MM-DD) and/or from source"""
+        for entry in self.entries:
+            if (date and entry["date"] != date) or (source and entry["source"] != source):
+                continue
+            yield from self._read_entry(entry)
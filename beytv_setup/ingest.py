@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+BeyTV Ingestion Pipeline - one staged path from feed URL to qBittorrent
+fetch -> parse -> normalize -> dedupe -> persist -> match -> push, each stage
+with its own worker threads and a bounded input queue, so a slow stage
+holds back the ones before it instead of buffering whole feeds in memory,
+and per-stage throughput/latency shows where a refresh spends its time
+"""
+
+import os
+import time
+import queue
+import threading
+
+from feeds import FeedItem, normalize_entry
+from feed_parser import parse_entries
+from feed_fetch import FEED_WORKERS
+from item_store import item_key
+from rules import RuleStore, match_items
+
+INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', '8'))
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', '2'))
+PUSH_RETRY_DAYS = float(os.environ.get('PUSH_RETRY_DAYS', '3'))  # unpushed matches are retried this long
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_latency = 0.0
+        self.started = None
+        self.finished = None
+
+    def add(self, latency, produced, failed=False):
+        with self.lock:
+            self.items_in += 1
+            self.items_out += produced
+            self.errors += failed
+            self.busy += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self):
+        wall = (self.finished or time.monotonic()) - self.started if self.started else 0
+        return {
+            'in': self.items_in,
+            'out': self.items_out,
+            'errors': self.errors,
+            'per_sec': round(self.items_in / wall, 2) if wall else 0,
+            'avg_latency_ms': round(self.busy / self.items_in * 1000, 2) if self.items_in else 0,
+            'max_latency_ms': round(self.max_latency * 1000, 2),
+        }
+
+
+class Stage:
+    """fn(item) returns an iterable of outputs (or None for nothing)"""
+
+    def __init__(self, name, fn, workers=1, maxsize=INGEST_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox = queue.Queue(maxsize)
+        self.stats = StageStats()
+
+
+class Pipeline:
+    """Stages connected by bounded queues; run() blocks until every input drained"""
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def run(self, inputs):
+        outputs = []
+        threads = []
+        for i, stage in enumerate(self.stages):
+            stage.stats.started = time.monotonic()
+            emit = self.stages[i + 1].inbox.put if i + 1 < len(self.stages) else outputs.append
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._work, args=(stage, emit, remaining, lock),
+                                     name=f'ingest-{stage.name}-{n}', daemon=True)
+                t.start()
+                threads.append(t)
+
+        head = self.stages[0]
+        for item in inputs:
+            head.inbox.put(item)  # blocks while the first stage is saturated
+        for _ in range(head.workers):
+            head.inbox.put(_DONE)
+        for t in threads:
+            t.join()
+        return outputs
+
+    def _work(self, stage, emit, remaining, lock):
+        while True:
+            item = stage.inbox.get()
+            if item is _DONE:
+                break
+            start = time.monotonic()
+            produced, failed = 0, False
+            try:
+                for out in stage.fn(item) or ():
+                    emit(out)
+                    produced += 1
+            except Exception as e:
+                failed = True
+                print(f"⚠️ Ingest stage '{stage.name}' failed: {e}")
+            # Latency includes time blocked on a full downstream queue (backpressure)
+            stage.stats.add(time.monotonic() - start, produced, failed)
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            stage.stats.finished = time.monotonic()
+            index = self.stages.index(stage)
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    self.stages[index + 1].inbox.put(_DONE)
+
+    def metrics(self):
+        return {stage.name: stage.stats.to_dict() for stage in self.stages}
+
+
+class FeedIngest:
+    """The feed pipeline shared by the dashboard, the hybrid server and the indexer.
+
+    fetch(url) returns the body (bytes, or None when unchanged). store is an
+    ItemStore; push(matches) gets (rule, item) pairs, returns the pairs it
+    queued or pushed successfully, and may be None. Rules run over every
+    stored item not yet pushed, not only new ones, so a failed push is
+    retried on the next run. After run(), items/new_items/matches hold what
+    passed each point.
+    """
+
+    def __init__(self, fetch, store, limit=None, push=None, match=match_items,
+                 on_parse_error=None, fetch_workers=FEED_WORKERS, parse_workers=PARSE_WORKERS):
+        self.fetch = fetch
+        self.store = store
+        self.limit = limit
+        self.push = push
+        self.match = match
+        self.on_parse_error = on_parse_error
+        self.rules = RuleStore(store.path) if match else None
+        self.items = []
+        self.new_items = []
+        self.matches = []
+        self.seen = set()
+        stages = [
+            Stage('fetch', self.fetch_stage, fetch_workers),
+            Stage('parse', self.parse_stage, parse_workers),
+            Stage('normalize', self.normalize_stage, parse_workers),
+            Stage('dedupe', self.dedupe_stage),
+            Stage('persist', self.persist_stage),
+        ]
+        if match:
+            stages.append(Stage('match', self.match_stage))
+        if match and push:
+            stages.append(Stage('push', self.push_stage))
+        self.pipeline = Pipeline(stages)
+
+    def run(self, sources):
+        """sources: (name, url) pairs; items are stored under name"""
+        self.pipeline.run(sources)
+        if self.match and self.push:
+            self.retry_unpushed()
+        self.store.prune()
+        return self
+
+    def metrics(self):
+        return self.pipeline.metrics()
+
+    def retry_unpushed(self):
+        """Matches left unpushed by earlier runs whose items this run did not see
+        (dropped off the feed, or the feed was unchanged)"""
+        since = time.time() - PUSH_RETRY_DAYS * 86400
+        stored = [item for item in self.store.first_seen_since(since) if item_key(item) not in self.seen]
+        for matches in self.match_stage(stored):
+            self.push_stage(matches)
+
+    def fetch_stage(self, source):
+        name, url = source
+        try:
+            body = self.fetch(url)
+        except Exception as e:
+            raise RuntimeError(f"{url}: {e}") from e
+        if body is None:
+            print(f"Unchanged {url}")
+            return
+        yield name, url, body
+
+    def parse_stage(self, fetched):
+        name, url, body = fetched
+        try:
+            entries = parse_entries(body, name, self.limit)
+        except ValueError:
+            if self.on_parse_error:
+                self.on_parse_error(url)  # do not let a broken download be cached as "unchanged"
+            raise
+        print(f"Fetched {url}: {len(entries)} entries")
+        yield name, entries
+
+    def normalize_stage(self, parsed):
+        name, entries = parsed
+        # The streaming parser already yields FeedItems; feedparser fallbacks need normalizing
+        yield [e if isinstance(e, FeedItem) else normalize_entry(e, name) for e in entries]
+
+    def dedupe_stage(self, batch):
+        # The same torrent often shows up on several feeds in one refresh
+        fresh = []
+        for item in batch:
+            key = item_key(item)
+            if key not in self.seen:
+                self.seen.add(key)
+                fresh.append(item)
+        self.items.extend(fresh)
+        if fresh:
+            yield fresh
+
+    def persist_stage(self, batch):
+        self.new_items.extend(self.store.upsert(batch))
+        yield batch
+
+    def match_stage(self, batch):
+        # Being stored is not being consumed: anything not pushed yet is still a candidate
+        matches = self.match(self.store.unpushed(batch), self.rules)
+        self.matches.extend(matches)
+        if matches:
+            yield matches
+
+    def push_stage(self, matches):
+        # Items and tracked episodes count as taken only once they really went out
+        pushed = self.push(matches)
+        self.store.mark_pushed(item for _, item in pushed)
+        self.rules.record_matches(pushed)
+        return ()
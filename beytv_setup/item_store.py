@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+BeyTV Item Store - persistent SQLite store of ingested feed items
+Items are keyed by infohash and survive after they drop off the upstream feed
+"""
+
+import os
+import re
+import math
+import time
+import hashlib
+import sqlite3
+
+from feeds import FeedItem, format_size
+
+DEFAULT_DB = os.environ.get(
+    'ITEM_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feed_items.db'))
+RETENTION_DAYS = int(os.environ.get('FEED_RETENTION_DAYS', '30'))
+MAX_ITEMS = int(os.environ.get('FEED_MAX_ITEMS', '5000'))
+PUSHED_RETENTION_DAYS = 365
+SQL_CHUNK = 500  # keys per IN (...) query
+
+# Search ranking: text relevance (bm25) boosted by seeders and recency
+SEEDERS_WEIGHT = 0.5
+RECENCY_WEIGHT = 2.0
+RECENCY_HALF_LIFE_DAYS = 14
+
+QUERY_TOKEN_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def item_key(item):
+    """Infohash when known, otherwise a stable key derived from the link"""
+    if item.infohash:
+        return item.infohash
+    return 'url:' + hashlib.sha1((item.magnet or item.link).encode('utf-8')).hexdigest()
+
+
+class ItemStore:
+    """SQLite-backed store of normalized feed items"""
+
+    def __init__(self, path=DEFAULT_DB, retention_days=RETENTION_DAYS, max_items=MAX_ITEMS):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_items = max_items
+        self.init_database()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Create tables and indexes"""
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS items (
+                infohash TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                link TEXT,
+                magnet TEXT,
+                size INTEGER DEFAULT 0,
+                published INTEGER DEFAULT 0,
+                seeders INTEGER DEFAULT 0,
+                source TEXT,
+                description TEXT,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_items_published ON items (published DESC)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_items_source ON items (source, published DESC)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_items_last_seen ON items (last_seen)')
+
+        # Items already sent to qBittorrent, kept longer than items so re-listed torrents are not re-pushed
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pushed (
+                infohash TEXT PRIMARY KEY,
+                pushed_at INTEGER NOT NULL
+            )
+        ''')
+
+        # Full-text index over titles, kept in sync with items by triggers
+        has_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'").fetchone()
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+                title, content='items', content_rowid='rowid', tokenize='unicode61'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+                INSERT INTO items_fts(rowid, title) VALUES (new.rowid, new.title);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+                INSERT INTO items_fts(items_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title ON items BEGIN
+                INSERT INTO items_fts(items_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+                INSERT INTO items_fts(rowid, title) VALUES (new.rowid, new.title);
+            END
+        ''')
+        if not has_fts:
+            # Index items stored before full-text search existed
+            conn.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+        conn.commit()
+        conn.close()
+
+    def upsert(self, items):
+        """Insert new items and refresh last_seen/metadata of known ones.
+
+        Returns the list of items that were not in the store before.
+        """
+        now = int(time.time())
+        new_items = []
+        conn = self.connect()
+        try:
+            with conn:
+                for item in items:
+                    key = item_key(item)
+                    cursor = conn.execute(
+                        'INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (key, item.title, item.link, item.magnet, item.size, item.published,
+                         item.seeders, item.source, item.description, now, now))
+                    if cursor.rowcount:
+                        new_items.append(item)
+                        continue
+                    conn.execute(
+                        'UPDATE items SET last_seen = ?, seeders = ?, '
+                        'size = CASE WHEN ? > 0 THEN ? ELSE size END WHERE infohash = ?',
+                        (now, item.seeders, item.size, item.size, key))
+        finally:
+            conn.close()
+        return new_items
+
+    def list_items(self, limit=50, offset=0, source=None):
+        """Newest-first page of stored items as dicts"""
+        sql = 'SELECT * FROM items'
+        params = []
+        if source:
+            sql += ' WHERE source = ?'
+            params.append(source)
+        sql += ' ORDER BY published DESC, first_seen DESC LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+
+        conn = self.connect()
+        try:
+            return [self.row_to_dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def search(self, query, limit=50):
+        """Full-text search over stored titles.
+
+        Supports "exact phrases" and prefix* terms; bare words are ANDed.
+        Hits are ranked by bm25 relevance boosted by seeders and recency.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        conn = self.connect()
+        try:
+            rows = conn.execute('''
+                SELECT items.*, bm25(items_fts) AS relevance
+                FROM items_fts JOIN items ON items.rowid = items_fts.rowid
+                WHERE items_fts MATCH ?
+                ORDER BY relevance LIMIT ?
+            ''', (match, limit * 5)).fetchall()
+        finally:
+            conn.close()
+
+        now = time.time()
+        scored = []
+        for row in rows:
+            data = self.row_to_dict(row)
+            age_days = max(now - (data['published'] or data['first_seen']), 0) / 86400
+            score = (-data.pop('relevance')
+                     + SEEDERS_WEIGHT * math.log1p(data['seeders'] or 0)
+                     + RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS))
+            scored.append((score, data))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [data for _, data in scored[:limit]]
+
+    def count(self, source=None):
+        conn = self.connect()
+        try:
+            if source:
+                return conn.execute('SELECT COUNT(*) FROM items WHERE source = ?', (source,)).fetchone()[0]
+            return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        finally:
+            conn.close()
+
+    def prune(self):
+        """Apply retention policy: drop items unseen for too long, then cap the total.
+
+        Returns the number of removed items.
+        """
+        cutoff = int(time.time()) - self.retention_days * 86400
+        conn = self.connect()
+        try:
+            with conn:
+                removed = conn.execute('DELETE FROM items WHERE last_seen < ?', (cutoff,)).rowcount
+                removed += conn.execute('''
+                    DELETE FROM items WHERE infohash IN (
+                        SELECT infohash FROM items ORDER BY published DESC, first_seen DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_items,)).rowcount
+            return removed
+        finally:
+            conn.close()
+
+    def first_seen_since(self, since):
+        """FeedItems first stored at or after the since epoch"""
+        conn = self.connect()
+        try:
+            rows = conn.execute('SELECT * FROM items WHERE first_seen >= ?', (int(since),)).fetchall()
+        finally:
+            conn.close()
+        return [FeedItem(row['title'], row['link'], row['magnet'],
+                         '' if row['infohash'].startswith('url:') else row['infohash'],
+                         row['size'], row['published'], row['seeders'], row['source'], row['description'])
+                for row in rows]
+
+    def unpushed(self, items):
+        """Items never pushed to qBittorrent before"""
+        items = list(items)
+        if not items:
+            return []
+        keys = [item_key(item) for item in items]
+        pushed = set()
+        conn = self.connect()
+        try:
+            # Chunked: SQLite before 3.32 allows at most 999 bound variables per statement
+            for i in range(0, len(keys), SQL_CHUNK):
+                chunk = keys[i:i + SQL_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                pushed.update(row[0] for row in conn.execute(
+                    f'SELECT infohash FROM pushed WHERE infohash IN ({marks})', chunk))
+        finally:
+            conn.close()
+        return [item for item, key in zip(items, keys) if key not in pushed]
+
+    def mark_pushed(self, items):
+        now = int(time.time())
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO pushed VALUES (?, ?)',
+                                 [(item_key(item), now) for item in items])
+                conn.execute('DELETE FROM pushed WHERE pushed_at < ?', (now - PUSHED_RETENTION_DAYS * 86400,))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def row_to_dict(row):
+        data = dict(row)
+        if data['infohash'].startswith('url:'):
+            data['infohash'] = ''
+        data['size_label'] = format_size(data['size'])
+        return data
+
+
+def build_match_query(query):
+    """Translate user input into a safe FTS5 MATCH expression"""
+    terms = []
+    for phrase, word in QUERY_TOKEN_RE.findall(query or ''):
+        if phrase:
+            terms.append('"%s"' % phrase)
+            continue
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '')
+        if word:
+            terms.append('"%s"%s' % (word, '*' if prefix else ''))
+    return ' '.join(terms)
@@ -85,6 +85,7 @@ class BeyTVLocalClient:
                 'client_id': self.client_id,
                 'downloads_path': str(self.downloads_path),
                 'available_space': available_space,
+                'pending_bytes': self.get_pending_bytes(),
                 'status': 'online'
             }
             
@@ -103,6 +104,19 @@ class BeyTVLocalClient:
             print(f"❌ Failed to check in with server: {e}")
             return []
 
+    def get_pending_bytes(self):
+        """Bytes qBittorrent still has to write for our downloads (None if unknown)"""
+        try:
+            session = requests.Session()
+            login_data = {"username": "admin", "password": "adminadmin"}
+            if session.post("http://localhost:8080/api/v2/auth/login", data=login_data, timeout=5).status_code != 200:
+                return None
+            torrents = session.get("http://localhost:8080/api/v2/torrents/info",
+                                   params={"category": "plex"}, timeout=5).json()
+            return sum(t.get('amount_left', 0) for t in torrents)
+        except Exception:
+            return None
+
     def categorize_content(self, title):
         """Determine if content is movie or TV show"""
         title_lower = title.lower()
@@ -5,23 +5,62 @@ Complete media management system with real torrent downloads
 """
 
 import os
+import re
 import json
 import sqlite3
 import time
 import shutil
 import subprocess
+import sys
+from pathlib import Path
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import requests
-import feedparser
 from datetime import datetime
+from feeds import parse_infohash, parse_size, parse_magnet_size, format_size
+from item_store import ItemStore
+from feed_fetch import FeedFetcher
+from ingest import FeedIngest
+from rules import RuleStore
+from qbt_scheduler import get_scheduler, snapshot_all, PRIORITY_INTERACTIVE, PRIORITY_POLL
+from circuit import CircuitBreaker
+from plugin_search import PluginSearch, reliability, snapshot_all as plugin_snapshot
+from search_rank import rank_results, SEARCH_RESOLUTION
+
+# Storage tier placement lives in the router pack
+sys.path.append(str(Path(__file__).resolve().parent / "router"))
+from placement import placement_path
+
+# Explicit (connect, read) timeouts for every WebUI call
+QBT_TIMEOUT = (float(os.environ.get('QBT_CONNECT_TIMEOUT', '3')),
+               float(os.environ.get('QBT_READ_TIMEOUT', '10')))
+
+# Comma-separated WebUI URLs; new torrents are spread across them by load
+QBT_BACKENDS = [u.strip() for u in os.environ.get(
+    'QBT_BACKENDS', os.environ.get('QB_URL', 'http://localhost:8080')).split(',') if u.strip()]
+QBT_USER = os.environ.get('QB_USER', 'admin')
+QBT_PASS = os.environ.get('QB_PASS', 'adminadmin')
+BACKEND_STATS_TTL = 10  # seconds between load samples per backend
+CLIENT_MIN_FREE = parse_size(os.environ.get('CLIENT_MIN_FREE', '5 GB'))  # headroom kept free on the client
 
 class QBittorrentAPI:
-    """qBittorrent Web API wrapper for real torrent downloads"""
+    """qBittorrent Web API wrapper for real torrent downloads
+    
+    All WebUI calls go through the shared CallScheduler; pass priority to
+    tell interactive dashboard calls apart from polls and background work.
+    While the WebUI is unreachable the circuit breaker rejects calls
+    immediately and probes for recovery in the background.
+    """
     
     def __init__(self, host='localhost', port=8080, username='admin', password='adminadmin'):
+        self.host = host
+        self.port = port
         self.base_url = f'http://{host}:{port}'
         self.session = requests.Session()
+        self.scheduler = get_scheduler(self.base_url)
+        self.breaker = CircuitBreaker(f'qBittorrent {self.base_url}', self.probe)
+        self.username = username
+        self.password = password
         self.logged_in = False
         
         # Auto-login
@@ -30,10 +69,47 @@ class QBittorrentAPI:
         except:
             print(f"⚠️ qBittorrent not connected at {self.base_url}")
     
+    def request(self, method, path, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Run one WebUI call through the shared scheduler
+        
+        A 403 means the session cookie expired (e.g. qBittorrent restarted):
+        log in again once and retry the call once.
+        """
+        response = self.send(method, path, priority, **kwargs)
+        if response.status_code == 403 and path != '/api/v2/auth/login':
+            self.logged_in = False
+            try:
+                self.login(self.username, self.password)
+            except Exception as e:
+                print(f"⚠️ qBittorrent re-login failed: {e}")
+                return response
+            response = self.send(method, path, priority, **kwargs)
+        return response
+    
+    def send(self, method, path, priority, **kwargs):
+        self.breaker.allow()
+        url = f'{self.base_url}{path}'
+        kwargs.setdefault('timeout', QBT_TIMEOUT)
+        try:
+            response = self.scheduler.call(lambda: self.session.request(method, url, **kwargs), priority)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+        return response
+    
+    def probe(self):
+        """Background recovery check used by the circuit breaker"""
+        login_data = {'username': self.username, 'password': self.password}
+        response = self.session.post(f'{self.base_url}/api/v2/auth/login', data=login_data, timeout=QBT_TIMEOUT)
+        if response.status_code != 200 or response.text != 'Ok.':
+            raise Exception(f"qBittorrent login failed: {response.text}")
+        self.logged_in = True
+    
     def login(self, username, password):
         """Login to qBittorrent Web UI"""
         login_data = {'username': username, 'password': password}
-        response = self.session.post(f'{self.base_url}/api/v2/auth/login', data=login_data)
+        response = self.request('POST', '/api/v2/auth/login', data=login_data)
         
         if response.status_code == 200 and response.text == 'Ok.':
             self.logged_in = True
@@ -42,46 +118,22 @@ class QBittorrentAPI:
         else:
             raise Exception(f"qBittorrent login failed: {response.text}")
     
-    def search(self, query, plugins='all', category='all'):
-        """Search torrents using qBittorrent plugins"""
+    def search(self, query, plugins='all', category='all', priority=PRIORITY_INTERACTIVE):
+        """Search torrents with each qBittorrent plugin in parallel
+        
+        Returns once enough plugins have finished or SEARCH_DEADLINE passes;
+        chronically slow plugins are skipped (see plugin_search).
+        """
         if not self.logged_in:
             return []
         
         try:
-            # Start search
-            search_data = {
-                'pattern': query,
-                'plugins': plugins,
-                'category': category
-            }
-            
-            response = self.session.post(f'{self.base_url}/api/v2/search/start', data=search_data)
-            
-            if response.status_code != 200:
-                return []
-            
-            search_id = response.json().get('id')
-            if not search_id:
-                return []
-            
-            # Wait a bit for results
-            time.sleep(2)
-            
-            # Get results
-            results_response = self.session.get(f'{self.base_url}/api/v2/search/results', 
-                                             params={'id': search_id})
-            
-            if results_response.status_code == 200:
-                data = results_response.json()
-                return data.get('results', [])
-            
-            return []
-            
+            return PluginSearch(self).run(query, plugins, category, priority)
         except Exception as e:
             print(f"Search error: {e}")
             return []
     
-    def add_torrent(self, url, save_path=None):
+    def add_torrent(self, url, save_path=None, priority=PRIORITY_INTERACTIVE):
         """Add torrent to qBittorrent"""
         if not self.logged_in:
             return False
@@ -91,36 +143,39 @@ class QBittorrentAPI:
             if save_path:
                 data['savepath'] = save_path
             
-            response = self.session.post(f'{self.base_url}/api/v2/torrents/add', data=data)
+            response = self.request('POST', '/api/v2/torrents/add', priority, data=data)
             return response.status_code == 200
             
         except Exception as e:
             print(f"Add torrent error: {e}")
             return False
     
-    def get_torrents(self):
+    def get_torrents(self, priority=PRIORITY_INTERACTIVE):
         """Get list of all torrents"""
         if not self.logged_in:
             return []
         
         try:
-            response = self.session.get(f'{self.base_url}/api/v2/torrents/info')
+            response = self.request('GET', '/api/v2/torrents/info', priority)
             if response.status_code == 200:
                 return response.json()
             return []
         except:
             return []
     
-    def get_status(self):
+    def get_status(self, priority=PRIORITY_POLL):
         """Get qBittorrent status"""
+        if self.breaker.state != 'closed':
+            # Cached offline status, no network round trip
+            return {'connected': False, 'breaker': self.breaker.snapshot()}
         if not self.logged_in:
             return {'connected': False}
         
         try:
-            response = self.session.get(f'{self.base_url}/api/v2/transfer/info')
+            response = self.request('GET', '/api/v2/transfer/info', priority)
             if response.status_code == 200:
                 data = response.json()
-                torrents = self.get_torrents()
+                torrents = self.get_torrents(priority)
                 return {
                     'connected': True,
                     'active_torrents': len(torrents),
@@ -131,6 +186,119 @@ class QBittorrentAPI:
         except:
             return {'connected': False}
 
+    def get_load(self, priority=PRIORITY_POLL):
+        """Active torrents, throughput and free disk, sampled at most every BACKEND_STATS_TTL"""
+        cached = getattr(self, '_load', None)
+        if cached and time.time() - cached['sampled_at'] < BACKEND_STATS_TTL:
+            return cached
+        
+        active = self.request('GET', '/api/v2/torrents/info', priority, params={'filter': 'active'}).json()
+        transfer = self.request('GET', '/api/v2/transfer/info', priority).json()
+        # Incremental sync: after the first call only changed fields come back
+        rid = cached['rid'] if cached else 0
+        maindata = self.request('GET', '/api/v2/sync/maindata', priority, params={'rid': rid}).json()
+        free_space = maindata.get('server_state', {}).get('free_space_on_disk')
+        if free_space is None:
+            free_space = cached['free_space'] if cached else 0
+        
+        self._load = {
+            'sampled_at': time.time(),
+            'rid': maindata.get('rid', rid),
+            'active': len(active),
+            'throughput': transfer.get('dl_info_speed', 0) + transfer.get('up_info_speed', 0),
+            'free_space': free_space,
+        }
+        return self._load
+
+class QBittorrentPool:
+    """Several qBittorrent backends behind the QBittorrentAPI interface
+    
+    New torrents go to the least loaded backend (active torrents, current
+    throughput, free disk); status and torrent lists are aggregated.
+    """
+    
+    def __init__(self, urls=None, username=QBT_USER, password=QBT_PASS):
+        self.backends = []
+        for url in urls or QBT_BACKENDS:
+            parsed = urlparse(url if '://' in url else f'http://{url}')
+            self.backends.append(QBittorrentAPI(parsed.hostname, parsed.port or 8080, username, password))
+    
+    def available(self):
+        """Backends that are logged in and not behind an open circuit"""
+        return [b for b in self.backends if b.logged_in and b.breaker.state == 'closed']
+    
+    def relogin(self):
+        for backend in self.backends:
+            if not backend.logged_in and backend.breaker.state == 'closed':
+                try:
+                    backend.login(backend.username, backend.password)
+                except Exception:
+                    pass
+    
+    def choose_backend(self, size=0):
+        """Least loaded backend with room for the torrent, or None"""
+        best, best_score = None, None
+        for backend in self.available():
+            try:
+                load = backend.get_load()
+            except Exception as e:
+                print(f"Load check failed for {backend.base_url}: {e}")
+                continue
+            if size and load['free_space'] and load['free_space'] < size:
+                continue
+            # One active torrent ~ 10 MB/s of traffic; more free disk breaks ties
+            score = (load['active'] + load['throughput'] / (10 * 1024 * 1024), -load['free_space'])
+            if best_score is None or score < best_score:
+                best, best_score = backend, score
+        return best
+    
+    def add_torrent(self, url, save_path=None, priority=PRIORITY_INTERACTIVE, size=0, title=None):
+        """Add torrent to the best backend, on the storage tier picked by the
+        placement rules unless save_path is given; returns that backend or None"""
+        backend = self.choose_backend(size)
+        if backend and backend.add_torrent(url, placement_path(url, title, size, save_path), priority):
+            if getattr(backend, '_load', None):
+                # Placement changed its load: resample next time, keeping the sync rid
+                backend._load['sampled_at'] = 0
+            return backend
+        return None
+    
+    def search(self, query, plugins='all', category='all', priority=PRIORITY_INTERACTIVE):
+        for backend in self.available():
+            return backend.search(query, plugins, category, priority)
+        return []
+    
+    def get_torrents(self, priority=PRIORITY_INTERACTIVE):
+        torrents = []
+        for backend in self.available():
+            for torrent in backend.get_torrents(priority):
+                torrent['backend'] = backend.base_url
+                torrents.append(torrent)
+        return torrents
+    
+    def get_status(self, priority=PRIORITY_POLL):
+        """Status summed across backends, with per-backend detail"""
+        backends = [dict(b.get_status(priority), url=b.base_url) for b in self.backends]
+        connected = [b for b in backends if b['connected']]
+        return {
+            'connected': bool(connected),
+            'active_torrents': sum(b['active_torrents'] for b in connected),
+            'download_speed': sum(b['download_speed'] for b in connected),
+            'upload_speed': sum(b['upload_speed'] for b in connected),
+            'backends': backends,
+        }
+
+_qbt = None
+
+def get_qbt():
+    """Shared qBittorrent backends, so handlers don't log in on every request"""
+    global _qbt
+    if _qbt is None:
+        _qbt = QBittorrentPool()
+    else:
+        _qbt.relogin()
+    return _qbt
+
 class RSSManager:
     """RSS feed manager for automatic torrent discovery"""
     
@@ -144,105 +312,31 @@ class RSSManager:
             'recent_tv': 'https://rarbg.to/rssdd.php?categories=18;41;49'
         }
     
-    def get_feed_items(self, feed_name, limit=10):
-        """Get items from specific RSS feed"""
-        if feed_name not in self.feeds:
-            return []
-        
-        try:
-            feed = feedparser.parse(self.feeds[feed_name])
-            items = []
-            
-            for entry in feed.entries[:limit]:
-                # Extract torrent info from RSS entry
-                item = {
-                    'title': entry.title,
-                    'description': getattr(entry, 'description', ''),
-                    'link': entry.link,
-                    'magnet': self.extract_magnet(entry),
-                    'size': self.extract_size(entry),
-                    'published': getattr(entry, 'published', ''),
-                    'source': feed_name
-                }
-                items.append(item)
-            
-            return items
-        except Exception as e:
-            print(f"RSS feed error for {feed_name}: {e}")
-            return []
-    
-    def extract_magnet(self, entry):
-        """Extract magnet link from RSS entry"""
-        # Check various possible locations for magnet links
-        if hasattr(entry, 'enclosures') and entry.enclosures:
-            for enclosure in entry.enclosures:
-                if enclosure.href.startswith('magnet:'):
-                    return enclosure.href
-        
-        # Check in description
-        description = getattr(entry, 'description', '')
-        if 'magnet:' in description:
-            import re
-            magnet_match = re.search(r'magnet:\?[^"<>\s]+', description)
-            if magnet_match:
-                return magnet_match.group(0)
-        
-        # Fallback to entry link if it's a magnet
-        if hasattr(entry, 'link') and entry.link.startswith('magnet:'):
-            return entry.link
-        
-        return entry.link  # Fallback to regular link
-    
-    def extract_size(self, entry):
-        """Extract file size from RSS entry"""
-        # Look for size in various formats
-        description = getattr(entry, 'description', '')
-        
-        import re
-        size_patterns = [
-            r'(\d+\.?\d*)\s*(GB|MB|TB)',
-            r'Size:\s*(\d+\.?\d*)\s*(GB|MB|TB)',
-            r'(\d+\.?\d*)\s*(GiB|MiB|TiB)'
-        ]
-        
-        for pattern in size_patterns:
-            match = re.search(pattern, description, re.IGNORECASE)
-            if match:
-                return f"{match.group(1)} {match.group(2)}"
-        
-        return "Unknown"
-    
-    def get_all_feeds(self, limit_per_feed=5):
-        """Get items from all RSS feeds"""
-        all_items = []
-        for feed_name in self.feeds:
-            items = self.get_feed_items(feed_name, limit_per_feed)
-            all_items.extend(items)
-        
-        # Sort by most recent
-        try:
-            all_items.sort(key=lambda x: x['published'], reverse=True)
-        except:
-            pass
-        
-        return all_items
+    def ingest(self, store, feed_names=None, limit=10, push=None):
+        """Run the ingestion pipeline over some feeds (all by default) into store"""
+        fetcher = FeedFetcher(store.path)
+        names = [name for name in (feed_names or self.feeds) if name in self.feeds]
+        ingest = FeedIngest(fetcher.fetch, store, limit=limit, push=push, on_parse_error=fetcher.forget)
+        return ingest.run([(name, self.feeds[name]) for name in names])
 
 class BeyTVServer(BaseHTTPRequestHandler):
+    store = None  # one ItemStore for the whole server, set in main()
     
     def __init__(self, *args, **kwargs):
         # Initialize qBittorrent connection and RSS manager
-        self.qbt = QBittorrentAPI()
+        self.qbt = get_qbt()
         self.rss = RSSManager()
         super().__init__(*args, **kwargs)
     
     def do_GET(self):
+        path = urlparse(self.path).path
         if self.path == '/':
             self.serve_dashboard()
-        elif self.path == '/api/feeds':
+        elif path == '/api/feeds':
             self.get_rss_feeds()
-        elif self.path == '/api/feeds/refresh':
+        elif path == '/api/feeds/refresh':
             self.refresh_feeds()
-        elif self.path.startswith('/api/feeds/'):
+        elif path.startswith('/api/feeds/'):
             self.get_specific_feed()
         elif self.path == '/api/local-status':
             self.get_local_status()
@@ -250,8 +344,14 @@ class BeyTVServer(BaseHTTPRequestHandler):
             self.get_qbt_status()
         elif self.path == '/api/qbt-torrents':
             self.get_qbt_torrents()
+        elif self.path == '/api/qbt-scheduler':
+            self.get_qbt_scheduler()
         elif self.path == '/api/queue':
             self.get_download_queue()
+        elif path == '/api/rules':
+            self.get_rules()
+        elif path == '/api/search/plugins':
+            self.get_search_plugins()
         elif self.path.startswith('/api/search'):
             self.search_torrents()
         else:
@@ -266,6 +366,10 @@ class BeyTVServer(BaseHTTPRequestHandler):
             self.client_checkin()
         elif self.path == '/api/client/update-status':
             self.update_download_status()
+        elif self.path == '/api/rules':
+            self.add_rule()
+        elif self.path == '/api/rules/delete':
+            self.delete_rule()
         else:
             self.send_error(404)
     
@@ -344,8 +448,8 @@ class BeyTVServer(BaseHTTPRequestHandler):
             
             <div class="card">
                 <h3>🔍 Manual Search</h3>
-                <input type="text" class="search-box" id="searchBox" placeholder="Search qBittorrent plugins..." onkeypress="handleSearch(event)">
-                <button class="btn" onclick="searchTorrents()">Search Plugins</button>
+                <input type="text" class="search-box" id="searchBox" placeholder="Search feed history and qBittorrent plugins..." onkeypress="handleSearch(event)">
+                <button class="btn" onclick="searchTorrents()">Search</button>
             </div>
         </div>
         
@@ -425,16 +529,16 @@ class BeyTVServer(BaseHTTPRequestHandler):
                 <div class="rss-item">
                     <div style="font-weight: bold;">${item.title}</div>
                     <div style="font-size: 0.9rem; opacity: 0.8; margin: 0.5rem 0;">
-                        Size: ${item.size} | 
+                        Size: ${item.size_label} | 
                         Source: ${item.source} | 
-                        Published: ${new Date(item.published).toLocaleDateString()}
+                        Published: ${item.published ? new Date(item.published * 1000).toLocaleDateString() : 'Unknown'}
                     </div>
                     <div style="font-size: 0.85rem; opacity: 0.7; margin: 0.5rem 0;">
                         ${item.description.substring(0, 150)}...
                     </div>
                     <div>
-                        <button class="btn torrent" onclick="addToQBT('${item.magnet}', '${item.title.replace(/'/g, "\\'")}')">Add to qBittorrent</button>
-                        <button class="btn download" onclick="queueForPlex('${item.magnet}', '${item.title.replace(/'/g, "\\'")}')">Queue for Plex</button>
+                        <button class="btn torrent" onclick="addToQBT('${item.magnet}', '${item.title.replace(/'/g, "\\'")}', ${item.size || 0})">Add to qBittorrent</button>
+                        <button class="btn download" onclick="queueForPlex('${item.magnet}', '${item.title.replace(/'/g, "\\'")}', ${item.size || 0})">Queue for Plex</button>
                         <button class="btn" onclick="viewDetails('${item.link}')">View Details</button>
                     </div>
                 </div>
@@ -473,6 +577,7 @@ class BeyTVServer(BaseHTTPRequestHandler):
                     <div>Active: ${status.active_torrents || 0} torrents</div>
                     <div>Download: ${Math.round((status.download_speed || 0) / 1024)}KB/s</div>
                     <div>Upload: ${Math.round((status.upload_speed || 0) / 1024)}KB/s</div>
+                    <div>Backends: ${(status.backends || []).filter(b => b.connected).length}/${(status.backends || []).length} online</div>
                 `;
                 statusIndicator.textContent = '🟢 RSS + qBittorrent Ready';
             } else {
@@ -480,6 +585,7 @@ class BeyTVServer(BaseHTTPRequestHandler):
                     <div style="color: #f44336;">🔴 qBittorrent Offline</div>
                     <div>Start qBittorrent with Web UI enabled</div>
                     <div>Default: http://localhost:8080</div>
+                    ${(status.backends || []).filter(b => b.breaker && b.breaker.next_probe_in !== null).map(b => `<div>${b.url}: retrying in ${b.breaker.next_probe_in}s</div>`).join('')}
                 `;
                 statusIndicator.textContent = '🔴 qBittorrent Needed';
             }
@@ -498,23 +604,34 @@ class BeyTVServer(BaseHTTPRequestHandler):
                 return;
             }
             
-            document.getElementById('searchContent').innerHTML = '<div class="loading">Searching qBittorrent plugins...</div>';
+            document.getElementById('searchContent').innerHTML = '<div class="loading">Searching local index...</div>';
             showTab('search');
             
+            let localResults = [];
             try {
-                const response = await fetch(`/api/search?q=${encodeURIComponent(query)}`);
-                const results = await response.json();
-                displaySearchResults(results);
+                // Local index answers immediately, plugin results are merged in when they arrive
+                const response = await fetch(`/api/search?q=${encodeURIComponent(query)}&source=local`);
+                localResults = await response.json();
+                displaySearchResults(localResults, true);
             } catch (error) {
                 document.getElementById('searchContent').innerHTML = '<div class="loading">❌ Search failed</div>';
             }
+            
+            try {
+                // Local and plugin results merged, deduped and ranked server-side
+                const response = await fetch(`/api/search?q=${encodeURIComponent(query)}&source=all`);
+                displaySearchResults(await response.json(), false);
+            } catch (error) {
+                displaySearchResults(localResults, false);
+            }
         }
         
-        function displaySearchResults(results) {
+        function displaySearchResults(results, pluginsPending) {
             const container = document.getElementById('searchContent');
+            const pending = pluginsPending ? '<div class="loading">Searching qBittorrent plugins...</div>' : '';
             
             if (!results || results.length === 0) {
-                container.innerHTML = '<div class="loading">No torrents found</div>';
+                container.innerHTML = pending || '<div class="loading">No torrents found</div>';
                 return;
             }
             
@@ -522,25 +639,25 @@ class BeyTVServer(BaseHTTPRequestHandler):
                 <div class="torrent-item">
                     <div style="font-weight: bold;">${item.fileName || item.title}</div>
                     <div style="font-size: 0.9rem; opacity: 0.8; margin: 0.5rem 0;">
-                        Size: ${item.fileSize || item.size} | 
-                        Seeds: ${item.nbSeeders || 0} | 
+                        Size: ${item.size_label || item.fileSize} | 
+                        Seeds: ${item.nbSeeders || item.seeders || 0} | 
                         Peers: ${item.nbLeechers || 0} | 
                         Site: ${item.siteUrl || item.source}
                     </div>
                     <div>
-                        <button class="btn torrent" onclick="addToQBT('${item.descrLink || item.url}', '${(item.fileName || item.title).replace(/'/g, "\\'")}')">Add to qBittorrent</button>
-                        <button class="btn download" onclick="queueForPlex('${item.descrLink || item.url}', '${(item.fileName || item.title).replace(/'/g, "\\'")}')">Queue for Plex</button>
+                        <button class="btn torrent" onclick="addToQBT('${item.descrLink || item.magnet || item.link}', '${(item.fileName || item.title).replace(/'/g, "\\'")}', ${item.fileSize || item.size || 0})">Add to qBittorrent</button>
+                        <button class="btn download" onclick="queueForPlex('${item.descrLink || item.magnet || item.link}', '${(item.fileName || item.title).replace(/'/g, "\\'")}', ${item.fileSize || item.size || 0})">Queue for Plex</button>
                     </div>
                 </div>
-            `).join('');
+            `).join('') + pending;
         }
         
-        async function addToQBT(magnetUrl, title) {
+        async function addToQBT(magnetUrl, title, size) {
             try {
                 const response = await fetch('/api/add-torrent', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({url: magnetUrl, title: title})
+                    body: JSON.stringify({url: magnetUrl, title: title, size: size})
                 });
                 
                 const result = await response.json();
@@ -555,12 +672,12 @@ class BeyTVServer(BaseHTTPRequestHandler):
             }
         }
         
-        async function queueForPlex(magnetUrl, title) {
+        async function queueForPlex(magnetUrl, title, size) {
             try {
                 const response = await fetch('/api/queue-download', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({id: Date.now(), title: title, url: magnetUrl})
+                    body: JSON.stringify({id: Date.now(), title: title, url: magnetUrl, size: size})
                 });
                 
                 const result = await response.json();
@@ -638,6 +755,7 @@ class BeyTVServer(BaseHTTPRequestHandler):
                         Status: ${item.status.toUpperCase()} | 
                         Queued: ${new Date(item.queued_at).toLocaleString()}
                         ${item.local_path ? '| Path: ' + item.local_path : ''}
+                        ${item.deferred_reason ? '| Waiting for space: ' + item.deferred_reason : ''}
                     </div>
                 </div>
             `).join('');
@@ -666,45 +784,87 @@ class BeyTVServer(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(html.encode())
     
+    def get_page_params(self, default_limit=50):
+        """Parse limit/offset query parameters; malformed values fall back to the defaults"""
+        query_params = parse_qs(urlparse(self.path).query)
+        def param(name, default):
+            try:
+                return int(query_params.get(name, [default])[0])
+            except ValueError:
+                return default
+        limit = min(max(param('limit', default_limit), 1), 500)
+        offset = max(param('offset', 0), 0)
+        return limit, offset
+    
+    def ingest_feeds(self, limit_per_feed=10, feed_names=None):
+        """Fetch RSS feeds into the local item store, queueing rule matches"""
+        return self.rss.ingest(self.store, feed_names, limit=limit_per_feed, push=self.queue_rule_matches)
+    
+    def queue_rule_matches(self, matches):
+        """Queue items matched by auto-download rules; FeedIngest marks them pushed"""
+        self.init_database()
+        conn = sqlite3.connect('download_queue.db')
+        conn.executemany(
+            'INSERT INTO downloads (title, url, status, torrent_hash, size) VALUES (?, ?, ?, ?, ?)',
+            [(item.title, item.magnet or item.link, 'queued', item.infohash, item.size) for _, item in matches]
+        )
+        conn.commit()
+        conn.close()
+        
+        for rule, item in matches:
+            print(f"🤖 Rule '{rule.name}' queued: {item.title}")
+        return matches
+    
+    def send_items(self, items, total):
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('X-Total-Count', str(total))
+        self.end_headers()
+        self.wfile.write(json.dumps(items).encode())
+    
     def get_rss_feeds(self):
-        """Get combined RSS feed items"""
+        """Get combined RSS feed items from the local store"""
         try:
-            items = self.rss.get_all_feeds(limit_per_feed=8)
+            limit, offset = self.get_page_params()
             
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(items).encode())
+            # Cold start: populate the store once, afterwards it is local reads only
+            if self.store.count() == 0:
+                self.ingest_feeds()
+            
+            self.send_items(self.store.list_items(limit, offset), self.store.count())
             
         except Exception as e:
             self.send_error(500, str(e))
     
     def get_specific_feed(self):
-        """Get items from specific RSS feed"""
+        """Get items from specific RSS feed from the local store"""
         try:
             # Extract feed name from path: /api/feeds/movies_1080p
-            feed_name = self.path.split('/')[-1]
-            items = self.rss.get_feed_items(feed_name, limit=20)
+            feed_name = urlparse(self.path).path.split('/')[-1]
+            if feed_name not in self.rss.feeds:
+                self.send_error(404, "Unknown feed")
+                return
             
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(items).encode())
+            limit, offset = self.get_page_params(default_limit=20)
+            if self.store.count(feed_name) == 0:
+                self.ingest_feeds(limit_per_feed=20, feed_names=[feed_name])
+            
+            self.send_items(self.store.list_items(limit, offset, source=feed_name),
+                            self.store.count(feed_name))
             
         except Exception as e:
             self.send_error(500, str(e))
     
     def refresh_feeds(self):
-        """Force refresh all RSS feeds"""
+        """Force refresh all RSS feeds into the local store"""
         try:
-            # Clear any cached data and fetch fresh
-            self.rss = RSSManager()
-            items = self.rss.get_all_feeds(limit_per_feed=10)
+            ingest = self.ingest_feeds(limit_per_feed=10)
             
             response = {
                 "status": "success", 
-                "message": f"Refreshed {len(items)} items from RSS feeds",
-                "items": items
+                "message": f"Refreshed {len(ingest.items)} items from RSS feeds ({len(ingest.new_items)} new)",
+                "items": self.store.list_items(limit=50),
+                "pipeline": ingest.metrics()
             }
             
             self.send_response(200)
@@ -726,6 +886,26 @@ class BeyTVServer(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, str(e))
     
+    def get_qbt_scheduler(self):
+        """Queue depth and wait times of the qBittorrent call scheduler"""
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(snapshot_all()).encode())
+        except Exception as e:
+            self.send_error(500, str(e))
+    
+    def get_search_plugins(self):
+        """Latency, failures and skip state of the search plugins"""
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(plugin_snapshot()).encode())
+        except Exception as e:
+            self.send_error(500, str(e))
+    
     def get_qbt_torrents(self):
         """Get active torrents from qBittorrent"""
         try:
@@ -738,16 +918,28 @@ class BeyTVServer(BaseHTTPRequestHandler):
             self.send_error(500, str(e))
     
     def add_torrent_to_qbt(self):
-        """Add torrent to qBittorrent"""
+        """Add torrent to the least loaded qBittorrent backend"""
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
             
-            success = self.qbt.add_torrent(data['url'])
-            
-            if success:
-                response = {"status": "success", "message": "Torrent added to qBittorrent"}
+            backend = self.qbt.add_torrent(data['url'], size=int(data.get('size') or 0), title=data.get('title'))
+            
+            if backend:
+                # Remember where the torrent lives
+                self.init_database()
+                conn = sqlite3.connect('download_queue.db')
+                conn.execute(
+                    'INSERT INTO downloads (title, url, status, torrent_hash, qbt_host, qbt_port) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (data.get('title') or data['url'], data['url'], 'downloading',
+                     parse_infohash(data['url']), backend.host, backend.port)
+                )
+                conn.commit()
+                conn.close()
+                
+                response = {"status": "success", "message": f"Torrent added to qBittorrent at {backend.base_url}"}
                 self.send_response(200)
             else:
                 response = {"status": "error", "message": "Failed to add torrent"}
@@ -761,7 +953,13 @@ class BeyTVServer(BaseHTTPRequestHandler):
             self.send_error(500, str(e))
     
     def search_torrents(self):
-        """Search torrents using qBittorrent plugins"""
+        """Search the local item index, optionally plus qBittorrent plugins
+        
+        source=local (default) answers from the FTS index in milliseconds,
+        source=plugins runs the slow plugin search, source=all merges both.
+        Plugin searches are deduped by infohash and ranked (optional
+        resolution= sets the preferred resolution).
+        """
         try:
             query_components = urlparse(self.path)
             query_params = parse_qs(query_components.query)
@@ -770,9 +968,15 @@ class BeyTVServer(BaseHTTPRequestHandler):
             if not search_query:
                 self.send_error(400, "Missing query parameter")
                 return
+            source = query_params.get('source', ['local'])[0]
             
-            # Use real qBittorrent search
-            results = self.qbt.search(search_query)
+            results = []
+            if source in ('local', 'all'):
+                results.extend(self.store.search(search_query))
+            if source in ('plugins', 'all'):
+                # Plugin results repeat releases and come in no useful order: dedupe and rank
+                results = rank_results(results + self.qbt.search(search_query), reliability(),
+                                       query_params.get('resolution', [SEARCH_RESOLUTION])[0])
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -795,8 +999,8 @@ class BeyTVServer(BaseHTTPRequestHandler):
             
             conn = sqlite3.connect('download_queue.db')
             conn.execute(
-                'INSERT INTO downloads (title, url, status, torrent_hash) VALUES (?, ?, ?, ?)',
-                (data['title'], data['url'], 'queued', '')
+                'INSERT INTO downloads (title, url, status, torrent_hash, size) VALUES (?, ?, ?, ?, ?)',
+                (data['title'], data['url'], 'queued', parse_infohash(data['url']), self.item_size(data))
             )
             conn.commit()
             conn.close()
@@ -810,6 +1014,63 @@ class BeyTVServer(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, str(e))
     
+    def get_rules(self):
+        """List auto-download rules"""
+        try:
+            rules = RuleStore().list_rules()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(rules).encode())
+        except Exception as e:
+            self.send_error(500, str(e))
+    
+    def add_rule(self):
+        """Create an auto-download rule
+        
+        Body: {"pattern": "show name" or "re:<regex>", "resolution": "1080p",
+               "min_size": "500 MB", "max_size": "20 GB", "feed": "tv_shows",
+               "track_episodes": true}
+        """
+        try:
+            content_length = int(self.headers['Content-Length'])
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            
+            if not data.get('pattern'):
+                self.send_error(400, "Missing pattern")
+                return
+            
+            try:
+                rule_id = RuleStore().add_rule(data)
+            except re.error as e:
+                self.send_error(400, f"Invalid pattern: {e}")
+                return
+            
+            response = {"status": "success", "id": rule_id}
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            self.send_error(500, str(e))
+    
+    def delete_rule(self):
+        """Delete an auto-download rule"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            RuleStore().delete_rule(int(data['id']))
+            
+            response = {"status": "success"}
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            self.send_error(500, str(e))
+    
     def get_download_queue(self):
         """Get current download queue"""
         try:
@@ -836,14 +1097,16 @@ class BeyTVServer(BaseHTTPRequestHandler):
             self.send_error(500, str(e))
     
     def get_local_status(self):
-        """Check if local client is connected"""
+        """Check if local client is connected and how much room it has left"""
         try:
             # Check database for recent client checkins
             self.init_database()
             
             conn = sqlite3.connect('download_queue.db')
-            cursor = conn.execute('SELECT last_seen FROM clients ORDER BY last_seen DESC LIMIT 1')
+            cursor = conn.execute(
+                'SELECT last_seen, downloads_path, available_space FROM clients ORDER BY last_seen DESC LIMIT 1')
             result = cursor.fetchone()
+            deferred = conn.execute("SELECT COUNT(*) FROM downloads WHERE status = 'deferred'").fetchone()[0]
             conn.close()
             
             if result:
@@ -855,8 +1118,9 @@ class BeyTVServer(BaseHTTPRequestHandler):
             
             response = {
                 "online": online,
-                "downloads_path": "~/Downloads/BeyTV",
-                "available_space": 50 * 1024 * 1024 * 1024  # 50GB mock
+                "downloads_path": result[1] if result else None,
+                "available_space": result[2] if result else None,
+                "deferred": deferred
             }
             
             self.send_response(200)
@@ -868,8 +1132,13 @@ class BeyTVServer(BaseHTTPRequestHandler):
             self.send_error(500, str(e))
     
     def client_checkin(self):
-        """Handle local client checkin"""
+        """Handle local client checkin and hand out the downloads that fit its disk"""
         try:
+            content_length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(content_length).decode('utf-8')) if content_length else {}
+            client_id = data.get('client_id', 'local_client')
+            available_space = data.get('available_space')
+            
             self.init_database()
             
             conn = sqlite3.connect('download_queue.db')
@@ -877,18 +1146,78 @@ class BeyTVServer(BaseHTTPRequestHandler):
             # Update or insert client status
             current_time = datetime.now().isoformat()
             conn.execute(
-                'INSERT OR REPLACE INTO clients (client_id, last_seen, status) VALUES (?, ?, ?)',
-                ('local_client', current_time, 'online')
+                'INSERT OR REPLACE INTO clients (client_id, last_seen, status, downloads_path, available_space) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (client_id, current_time, data.get('status', 'online'), data.get('downloads_path'), available_space)
             )
             conn.commit()
+            
+            admitted, deferred = self.admit_downloads(conn, client_id, available_space, data.get('pending_bytes'))
             conn.close()
             
-            # Return any pending downloads
-            self.get_download_queue()
+            response = {"queued_downloads": admitted, "deferred": deferred}
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
             
         except Exception as e:
             self.send_error(500, str(e))
     
+    def admit_downloads(self, conn, client_id, available_space, pending_bytes=None):
+        """Hand out queued downloads oldest first while they fit in the client's free space.
+        
+        Space is reserved for data the client is still fetching: the bytes left
+        in its torrent client when it reports them, otherwise the full size of
+        everything already handed out. Items that do not fit stay 'deferred'
+        and are checked again on the next checkin.
+        """
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT * FROM downloads WHERE status IN ('queued', 'deferred') ORDER BY id").fetchall()
+        if not rows:
+            return [], 0
+        
+        if available_space is None:
+            budget = None  # client did not report its disk, nothing to check against
+        else:
+            in_flight = pending_bytes
+            if in_flight is None:
+                in_flight = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM downloads WHERE status IN ('dispatched', 'downloading') "
+                    "AND client_id = ?", (client_id,)).fetchone()[0]
+            budget = int(available_space) - in_flight - CLIENT_MIN_FREE
+        
+        admitted, deferred = [], []
+        for row in rows:
+            size = row['size'] or 0
+            if budget is not None and size > budget:
+                deferred.append((f"needs {format_size(size)}, {format_size(max(budget, 0))} free", row['id']))
+                continue
+            if budget is not None:
+                budget -= size
+            admitted.append(dict(row, status='dispatched', client_id=client_id))
+        
+        with conn:
+            conn.executemany(
+                "UPDATE downloads SET status = 'dispatched', client_id = ?, deferred_reason = NULL WHERE id = ?",
+                [(client_id, item['id']) for item in admitted])
+            conn.executemany(
+                "UPDATE downloads SET status = 'deferred', deferred_reason = ? WHERE id = ?", deferred)
+        for reason, download_id in deferred:
+            print(f"⏸️ Deferred download #{download_id} for {client_id}: {reason}")
+        return admitted, len(deferred)
+    
+    @staticmethod
+    def item_size(data):
+        """Expected size of a queued item: explicit size, magnet xl= or a size in the title"""
+        size = data.get('size')
+        if isinstance(size, (int, float)) and size > 0:
+            return int(size)
+        if isinstance(size, str) and size.strip():
+            return int(size) if size.isdigit() else parse_size(size)
+        return parse_magnet_size(data.get('url')) or parse_size(data.get('title'))
+    
     def update_download_status(self):
         """Update download status from local client"""
         try:
@@ -899,7 +1228,7 @@ class BeyTVServer(BaseHTTPRequestHandler):
             conn = sqlite3.connect('download_queue.db')
             conn.execute(
                 'UPDATE downloads SET status = ?, local_path = ? WHERE id = ?',
-                (data['status'], data.get('local_path', ''), data['id'])
+                (data['status'], data.get('local_path', ''), data.get('download_id', data.get('id')))
             )
             conn.commit()
             conn.close()
@@ -941,6 +1270,16 @@ class BeyTVServer(BaseHTTPRequestHandler):
             )
         ''')
         
+        # Columns added after the first release
+        for table, column, kind in (('downloads', 'size', 'INTEGER DEFAULT 0'),
+                                    ('downloads', 'client_id', 'TEXT'),
+                                    ('downloads', 'deferred_reason', 'TEXT'),
+                                    ('clients', 'downloads_path', 'TEXT'),
+                                    ('clients', 'available_space', 'INTEGER')):
+            columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if column not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+        
         conn.commit()
         conn.close()
 
@@ -951,6 +1290,7 @@ def main():
     # Initialize database
     server = BeyTVServer
     server.init_database(server)
+    server.store = ItemStore()
     
     # Start server
     port = int(os.environ.get('PORT', 8000))
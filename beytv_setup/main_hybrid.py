@@ -11,10 +11,35 @@ import threading
 import requests
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import feedparser
 from pathlib import Path
+from item_store import ItemStore
+from feed_fetch import FeedFetcher
+from ingest import FeedIngest
+from rules import parse_resolution
+
+HYBRID_FEEDS = {
+    'YTS': 'https://yts.mx/rss/0/all/all/0',
+    'EZTV': 'https://eztv.re/ezrss.xml',
+}
+FEED_REFRESH = int(os.environ.get('FEED_REFRESH', '900'))  # seconds between pipeline runs
+FEED_LIMIT = int(os.environ.get('FEED_LIMIT', '20'))
+_ingest_lock = threading.Lock()
+_last_ingest = [0.0]
+
+def refresh_feeds(store):
+    """Run the ingestion pipeline at most once per FEED_REFRESH seconds"""
+    with _ingest_lock:
+        if time.time() - _last_ingest[0] < FEED_REFRESH and store.count():
+            return
+        fetcher = FeedFetcher(store.path)
+        # No rules here: downloads are picked by hand and sent to the local client
+        FeedIngest(fetcher.fetch, store, limit=FEED_LIMIT, match=None,
+                   on_parse_error=fetcher.forget).run(HYBRID_FEEDS.items())
+        _last_ingest[0] = time.time()
 
 class BeyTVHybridHandler(SimpleHTTPRequestHandler):
+    store = None  # one ItemStore for the whole server, set in run_server()
+
     def do_GET(self):
         if self.path == '/':
             self.serve_dashboard()
@@ -439,32 +464,17 @@ class BeyTVHybridHandler(SimpleHTTPRequestHandler):
         self.wfile.write(html.encode())
     
     def serve_feeds(self):
-        # Sample feeds with download URLs
+        refresh_feeds(self.store)
         feeds_data = [
             {
-                "id": "1",
-                "title": "Sample Movie 2025 [1080p]",
-                "source": "YTS",
-                "quality": "1080p",
-                "size": "1.2GB",
-                "magnet": "magnet:?xt=urn:btih:samplehash1&dn=Sample+Movie+2025"
-            },
-            {
-                "id": "2", 
-                "title": "Popular TV Series S01E01 [720p]",
-                "source": "EZTV",
-                "quality": "720p", 
-                "size": "350MB",
-                "magnet": "magnet:?xt=urn:btih:samplehash2&dn=TV+Series+S01E01"
-            },
-            {
-                "id": "3",
-                "title": "Documentary Collection [720p]",
-                "source": "Archive",
-                "quality": "720p",
-                "size": "800MB",
-                "magnet": "magnet:?xt=urn:btih:samplehash3&dn=Documentary+Collection"
+                "id": item["infohash"] or str(n),
+                "title": item["title"],
+                "source": item["source"],
+                "quality": parse_resolution(item["title"]) or None,
+                "size": item["size_label"] if item["size"] else None,
+                "magnet": item["magnet"] or item["link"]
             }
+            for n, item in enumerate(self.store.list_items(limit=50), 1)
         ]
         
         self.send_response(200)
@@ -574,6 +584,7 @@ if __name__ == "__main__":
 def run_server():
     """Run the BeyTV Hybrid server"""
     port = int(os.environ.get('PORT', 3000))
+    BeyTVHybridHandler.store = ItemStore()
     server = HTTPServer(('0.0.0.0', port), BeyTVHybridHandler)
     print(f"🎬 BeyTV Hybrid starting on port {port}")
     print(f"🌐 Remote Dashboard: http://localhost:{port}")
@@ -1,8 +1,17 @@
-import os, json, time
+import os, sys, time, argparse, threading
 from pathlib import Path
+from collections import OrderedDict
 import requests
 from dotenv import load_dotenv
 from plexapi.server import PlexServer
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Shared BeyTV modules live one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from plex_recent import recently_added
+from seen_store import SeenStore
+from qbt_scheduler import TokenBucket
+from plex_webhooks import parse_webhook
 
 load_dotenv()
 PLEX_URL = os.getenv("PLEX_URL","http://localhost:32400")
@@ -10,6 +19,25 @@ PLEX_TOKEN = os.getenv("PLEX_TOKEN")
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 MAX_ITEMS = int(os.getenv("MAX_ITEMS","25"))
+SEEN_DB = os.getenv("SEEN_DB", "seen.db")
+SEEN_RETENTION_DAYS = int(os.getenv("SEEN_RETENTION_DAYS","180"))
+TELEGRAM_API = os.getenv("TELEGRAM_API","https://api.telegram.org").rstrip("/")
+TG_RATE = float(os.getenv("TG_RATE","1"))       # messages per second to one chat
+TG_BURST = int(os.getenv("TG_BURST","3"))
+TG_RETRIES = int(os.getenv("TG_RETRIES","4"))
+MESSAGE_LIMIT = 4000
+NOTIFY_SOURCES = {s.strip() for s in os.getenv("NOTIFY_SOURCES","webhook,websocket").split(",") if s.strip()}
+NOTIFY_PORT = int(os.getenv("NOTIFY_PORT","8089"))
+NOTIFY_WINDOW = float(os.getenv("NOTIFY_WINDOW","3"))       # seconds to batch events into one digest
+NOTIFY_RETRY_DELAY = float(os.getenv("NOTIFY_RETRY_DELAY","60"))
+WS_RECONNECT_MAX = float(os.getenv("WS_RECONNECT_MAX","300"))  # longest wait between websocket reconnects
+CREATED_TTL = float(os.getenv("CREATED_TTL","21600"))          # forget 'created' items never processed
+CREATED_MAX = 1000
+
+# Plex websocket timeline entries
+TIMELINE_CREATED = 0
+TIMELINE_DONE = 5
+TIMELINE_TYPES = {1, 2, 4}  # movie, show, episode
 
 assert PLEX_TOKEN, "PLEX_TOKEN missing"
 assert BOT_TOKEN, "TELEGRAM_BOT_TOKEN missing"
@@ -18,53 +46,216 @@ assert CHAT_ID, "TELEGRAM_CHAT_ID missing"
 def plex():
     return PlexServer(PLEX_URL, PLEX_TOKEN)
 
-def tg_send(text):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    requests.post(url, json={"chat_id": CHAT_ID, "text": text[:4000]}, timeout=20)
+tg_bucket = TokenBucket(TG_RATE, TG_BURST)
+chat_lock = threading.Lock()  # one sender at a time, so the chat gets messages in order
 
-def load_state(path):
-    if path.exists():
+def tg_send(text):
+    """Send one message, retrying on errors; True once Telegram accepted it"""
+    url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendMessage"
+    for attempt in range(TG_RETRIES + 1):
+        tg_bucket.take()
+        delay = 2 ** attempt
         try:
-            return json.loads(path.read_text())
-        except Exception:
-            return {}
-    return {}
+            r = requests.post(url, json={"chat_id": CHAT_ID, "text": text[:MESSAGE_LIMIT]}, timeout=20)
+            if r.status_code == 200:
+                return True
+            if r.status_code == 429:
+                # Telegram says how long to back off
+                delay = r.json().get("parameters", {}).get("retry_after", delay)
+            elif r.status_code < 500:
+                print(f"Telegram rejected message: {r.status_code} {r.text[:200]}")
+                return False
+        except (requests.RequestException, ValueError) as e:
+            print("Telegram send failed:", e)
+        if attempt < TG_RETRIES:
+            time.sleep(delay)
+    return False
+
+def build_digests(msgs, limit=MESSAGE_LIMIT):
+    """Pack (guid, line) pairs into [(guids, text)] messages of at most limit characters"""
+    digests, guids, lines, size = [], [], [], 0
+    for guid, line in msgs:
+        line = line[:limit]
+        if lines and size + 1 + len(line) > limit:
+            digests.append((guids, "\n".join(lines)))
+            guids, lines, size = [], [], 0
+        guids.append(guid)
+        lines.append(line)
+        size += len(line) + (1 if size else 0)
+    if lines:
+        digests.append((guids, "\n".join(lines)))
+    return digests
+
+def deliver(msgs, seen):
+    """Send digests one after another, in order; mark items seen only once delivered.
+    After a failed digest the rest wait for the retry too, so nothing overtakes it."""
+    delivered = set()
+    with chat_lock:
+        for guids, text in build_digests(msgs):
+            if not tg_send(text):
+                break
+            seen.add(*guids)
+            delivered.update(guids)
+    failed = [(guid, msg) for guid, msg in msgs if guid not in delivered]
+    if failed:
+        print(f"{len(failed)} notification(s) not delivered, will retry")
+    return failed
+
+def item_guid(it):
+    return str(getattr(it, "guid", None) or getattr(it, "ratingKey", None) or "")
 
-def save_state(path, data):
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2))
+def format_message(title, year, kind):
+    return f"🎬 New in Plex: {title or 'Unknown'} {f'({year})' if year else ''} [{kind or 'item'}]"
+
+def seen_store():
+    store = SeenStore(SEEN_DB, SEEN_RETENTION_DAYS)
+    migrated = store.import_json("state.json")
+    if migrated:
+        print(f"Imported {migrated} seen item(s) from state.json")
+    return store
 
 def main():
-    state_path = Path("state.json")
-    state = load_state(state_path)
-    seen = set(state.get("seen", []))
+    seen = seen_store()
 
     p = plex()
-    items = []
-    for s in p.library.sections():
-        if s.type in ("movie","show"):
-            items.extend(s.recentlyAdded() or [])
-    # newest first
-    items.sort(key=lambda x: getattr(x, "addedAt", 0), reverse=True)
-    items = items[:MAX_ITEMS]
+    items = recently_added(p, MAX_ITEMS)  # newest first
 
     new_msgs = []
+    unseen = seen.unseen(item_guid(it) for it in items)
     for it in items:
-        guid = getattr(it, "guid", None) or getattr(it, "ratingKey", None)
-        if not guid:
-            continue
-        if guid in seen:
+        guid = item_guid(it)
+        if not guid or guid not in unseen:
             continue
-        title = getattr(it, "title", "Unknown")
-        year = getattr(it, "year", "")
-        kind = getattr(it, "type", "item")
-        msg = f"🎬 New in Plex: {title} {f'({year})' if year else ''} [{kind}]"
+        msg = format_message(getattr(it, "title", "Unknown"), getattr(it, "year", ""), getattr(it, "type", "item"))
         new_msgs.append((guid, msg))
 
     if new_msgs:
-        for guid, msg in reversed(new_msgs):  # send oldest first
-            tg_send(msg)
-            seen.add(guid)
-        save_state(state_path, {"seen": list(seen)})
+        deliver(list(reversed(new_msgs)), seen)  # oldest first
+        seen.prune()
+
+class EventNotifier:
+    """Collects library.new events for a short window and sends them as one digest"""
+
+    def __init__(self, seen, window=NOTIFY_WINDOW):
+        self.seen = seen
+        self.window = window
+        self.pending = {}   # guid -> message, in arrival order
+        self.created = OrderedDict()  # websocket itemID -> time created, not processed yet
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, guid, msg):
+        if not guid:
+            return
+        with self.lock:
+            self.pending.setdefault(guid, msg)
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.timer = None
+        unseen = self.seen.unseen(pending)
+        msgs = [(guid, msg) for guid, msg in pending.items() if guid in unseen]
+        if not msgs:
+            return
+        failed = deliver(msgs, self.seen)
+        self.seen.prune()
+        if failed:
+            retry = threading.Timer(NOTIFY_RETRY_DELAY, lambda: [self.add(g, m) for g, m in failed])
+            retry.daemon = True
+            retry.start()
+
+    def on_webhook(self, payload):
+        if payload.get("event") != "library.new":
+            return
+        md = payload.get("Metadata") or {}
+        guid = str(md.get("guid") or md.get("ratingKey") or "")
+        self.add(guid, format_message(md.get("title"), md.get("year"), md.get("type")))
+
+    def on_alert(self, plex_server, data):
+        """Plex websocket: an item is new once it goes from 'created' to processed"""
+        if data.get("type") != "timeline":
+            return
+        for entry in data.get("TimelineEntry", []):
+            if entry.get("type") not in TIMELINE_TYPES or not entry.get("itemID"):
+                continue
+            item_id = int(entry["itemID"])
+            state = entry.get("state")
+            if state == TIMELINE_CREATED and entry.get("metadataState") == "created":
+                self.track_created(item_id)
+            elif state == TIMELINE_DONE and self.created.pop(item_id, None) is not None:
+                threading.Thread(target=self.add_item, args=(plex_server, item_id), daemon=True).start()
+
+    def track_created(self, item_id, now=None):
+        """Remember a created item; ones never processed expire after CREATED_TTL"""
+        now = time.time() if now is None else now
+        self.created.pop(item_id, None)
+        self.created[item_id] = now
+        while self.created:
+            oldest_id, created_at = next(iter(self.created.items()))
+            if now - created_at < CREATED_TTL and len(self.created) <= CREATED_MAX:
+                break
+            del self.created[oldest_id]
+
+    def add_item(self, plex_server, item_id):
+        try:
+            it = plex_server.fetchItem(item_id)
+        except Exception as e:
+            print(f"Could not load Plex item {item_id}:", e)
+            return
+        self.add(item_guid(it), format_message(getattr(it, "title", "Unknown"), getattr(it, "year", ""), getattr(it, "type", "item")))
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    notifier = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.notifier.on_webhook(parse_webhook(self.headers.get("Content-Type", ""), body))
+        self.send_response(202)
+        self.end_headers()
+
+def listen_websocket(notifier, max_delay=WS_RECONNECT_MAX):
+    """Keep the Plex websocket open, reconnecting with exponential backoff when it drops"""
+    delay = 1
+    while True:
+        started = time.time()
+        try:
+            p = plex()
+            listener = p.startAlertListener(lambda data: notifier.on_alert(p, data),
+                                            callbackError=lambda e: print("Plex websocket error:", e))
+            print("Listening for Plex library events on the websocket")
+            listener.join()  # returns once the websocket closed
+        except Exception as e:
+            print("Plex websocket connect failed:", e)
+        if time.time() - started > max_delay:
+            delay = 1  # it was up for a while: a fresh drop, not a flapping server
+        print(f"Plex websocket closed, reconnecting in {delay}s")
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+def run_daemon(port=NOTIFY_PORT):
+    """Notify from Plex events as they happen instead of polling the library"""
+    notifier = EventNotifier(seen_store())
+    if "websocket" in NOTIFY_SOURCES:
+        threading.Thread(target=listen_websocket, args=(notifier,), name="plex-websocket", daemon=True).start()
+    if "webhook" in NOTIFY_SOURCES:
+        WebhookHandler.notifier = notifier
+        print(f"Accepting Plex webhooks on http://0.0.0.0:{port}/")
+        ThreadingHTTPServer(("0.0.0.0", port), WebhookHandler).serve_forever()
+    else:
+        while True:
+            time.sleep(3600)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="BeyTV Telegram notifier")
+    parser.add_argument("--daemon", action="store_true", help="react to Plex events instead of polling once")
+    parser.add_argument("--port", type=int, default=NOTIFY_PORT)
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon(args.port)
+    else:
+        main()
@@ -0,0 +1,79 @@
+"""
+BeyTV Notifier Seen Store - which Plex items were already announced
+One indexed SQLite row per GUID: membership checks are primary-key lookups,
+marking an item is a single insert, and old rows are pruned so the file
+stays bounded instead of growing for ever
+"""
+
+import json
+import time
+import sqlite3
+from pathlib import Path
+
+SQL_CHUNK = 500  # guids per IN (...) query
+
+
+class SeenStore:
+    def __init__(self, path, retention_days=180, max_entries=20000):
+        self.path = str(path)
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS seen (guid TEXT PRIMARY KEY, seen_at INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_at ON seen (seen_at)")
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def unseen(self, guids):
+        """The subset of guids not announced yet, in one query"""
+        guids = list(guids)
+        if not guids:
+            return set()
+        known = set()
+        conn = self.connect()
+        try:
+            # Chunked: SQLite before 3.32 allows at most 999 bound variables per statement
+            for i in range(0, len(guids), SQL_CHUNK):
+                chunk = guids[i:i + SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                known.update(row[0] for row in conn.execute(f"SELECT guid FROM seen WHERE guid IN ({marks})", chunk))
+        finally:
+            conn.close()
+        return set(guids) - known
+
+    def add(self, *guids):
+        now = int(time.time())
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO seen VALUES (?, ?)", [(g, now) for g in guids])
+        finally:
+            conn.close()
+
+    def prune(self):
+        """Forget entries past the retention period, then cap the row count"""
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM seen WHERE seen_at < ?", (int(time.time()) - self.retention_days * 86400,))
+                conn.execute("DELETE FROM seen WHERE guid IN (SELECT guid FROM seen ORDER BY seen_at DESC LIMIT -1 OFFSET ?)",
+                             (self.max_entries,))
+        finally:
+            conn.close()
+
+    def import_json(self, state_path):
+        """One-off migration of the old state.json seen list"""
+        state_path = Path(state_path)
+        if not state_path.exists():
+            return 0
+        try:
+            seen = json.loads(state_path.read_text()).get("seen", [])
+        except Exception:
+            seen = []
+        self.add(*(str(guid) for guid in seen))
+        state_path.rename(state_path.with_name(state_path.name + ".migrated"))
+        return len(seen)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+BeyTV OMDb Cache - persistent SQLite cache of OMDb responses
+Responses are stored under the IMDb id and under (title, year) so either
+kind of lookup hits. Misses ("Response": "False") are cached too, with a
+shorter TTL, so unknown titles are not asked about on every run
+"""
+
+import os
+import json
+import time
+import sqlite3
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'omdb_cache.db')
+DEFAULT_TTL = 7 * 86400
+DEFAULT_NEGATIVE_TTL = 86400
+
+
+def id_key(imdb_id):
+    return 'i:' + imdb_id.lower()
+
+
+def title_key(title, year=None):
+    return 't:%s|%s' % (' '.join((title or '').lower().split()), year or '')
+
+
+class OMDbCache:
+    """SQLite-backed OMDb response cache, safe to share between threads"""
+
+    def __init__(self, path=DEFAULT_DB, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.init_database()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def init_database(self):
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS omdb_cache (
+                key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at INTEGER NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get(self, key):
+        """Cached response for key, or None when absent or expired"""
+        conn = self.connect()
+        try:
+            row = conn.execute('SELECT data, expires_at FROM omdb_cache WHERE key = ?', (key,)).fetchone()
+        finally:
+            conn.close()
+        if not row or row[1] < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, data, *keys):
+        """Store a response under keys, plus its own IMDb id and title/year when present"""
+        if data is None:
+            return  # network failure: nothing to remember
+        if data.get('Response') == 'False':
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttl
+            keys += (id_key(data['imdbID']),) if data.get('imdbID') else ()
+            keys += (title_key(data['Title'], data.get('Year', '')[:4]),) if data.get('Title') else ()
+        expires_at = int(time.time() + ttl)
+        payload = json.dumps(data)
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO omdb_cache VALUES (?, ?, ?)',
+                                 [(key, payload, expires_at) for key in set(keys)])
+        finally:
+            conn.close()
+
+    def prune(self):
+        """Drop expired entries"""
+        conn = self.connect()
+        try:
+            with conn:
+                return conn.execute('DELETE FROM omdb_cache WHERE expires_at < ?', (int(time.time()),)).rowcount
+        finally:
+            conn.close()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+BeyTV Plex Recently Added - bounded newest-first retrieval across sections
+Each section is asked for at most max_items entries (Plex pages them with
+X-Plex-Container-Size), then sections are merged with heapq.nlargest, so
+work grows with max_items rather than with the size of the library
+"""
+
+import heapq
+import itertools
+
+
+def added_at(item):
+    """addedAt as epoch seconds (plexapi returns a datetime)"""
+    value = getattr(item, "addedAt", None)
+    if hasattr(value, "timestamp"):
+        return int(value.timestamp())
+    return int(value or 0)
+
+
+def recently_added(plex, max_items, types=("movie", "show")):
+    """Newest max_items items over all sections of the given types"""
+    per_section = (section.recentlyAdded(maxresults=max_items) or []
+                   for section in plex.library.sections() if section.type in types)
+    return heapq.nlargest(max_items, itertools.chain.from_iterable(per_section), key=added_at)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+BeyTV Plex Webhooks - decode Plex webhook requests
+Plex posts multipart/form-data with the event JSON in a 'payload' field
+(plus an optional thumbnail); local stand-ins may post plain JSON instead
+"""
+
+import json
+from email.parser import BytesParser
+
+
+def parse_webhook(content_type, body):
+    """Webhook payload as a dict ({} when it cannot be decoded)"""
+    try:
+        if content_type.startswith("multipart/"):
+            message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+            for part in message.walk():
+                if part.get_param("name", header="content-disposition") == "payload":
+                    return json.loads(part.get_payload(decode=True))
+            return {}
+        return json.loads(body or b"{}")
+    except (ValueError, AttributeError):
+        return {}
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+BeyTV Plugin Search - per-plugin qBittorrent search fan-out
+One search job per enabled plugin instead of a single plugins=all job, so
+results come back as soon as a quorum of plugins has finished (or the
+deadline passes) rather than at the pace of the slowest one. Plugin
+latency and failures are tracked, and plugins that keep missing the
+deadline are skipped for a while
+"""
+
+import os
+import time
+import math
+import threading
+from collections import deque
+
+from qbt_scheduler import PRIORITY_INTERACTIVE
+
+SEARCH_DEADLINE = float(os.environ.get('SEARCH_DEADLINE', '8'))      # seconds per search
+SEARCH_QUORUM = float(os.environ.get('SEARCH_QUORUM', '0.6'))        # share of plugins to wait for
+SEARCH_MAX_JOBS = int(os.environ.get('SEARCH_MAX_JOBS', '5'))        # qBittorrent allows 5 concurrent searches
+SEARCH_SLOW_STRIKES = int(os.environ.get('SEARCH_SLOW_STRIKES', '3'))
+SEARCH_SKIP_SECONDS = int(os.environ.get('SEARCH_SKIP_SECONDS', '900'))
+SEARCH_POLL = 0.5
+PLUGIN_LIST_TTL = 300
+
+
+class PluginStats:
+    def __init__(self):
+        self.searches = 0
+        self.finished = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.strikes = 0
+        self.avg_latency = None
+        self.skip_until = 0
+
+    def to_dict(self):
+        return {
+            'searches': self.searches,
+            'finished': self.finished,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+            'avg_latency_ms': round(self.avg_latency * 1000) if self.avg_latency is not None else None,
+            'skipped_for_s': max(0, round(self.skip_until - time.time())),
+        }
+
+
+class PluginTracker:
+    """Latency and failure history of one WebUI's search plugins"""
+
+    def __init__(self, strikes=SEARCH_SLOW_STRIKES, skip_seconds=SEARCH_SKIP_SECONDS):
+        self.strikes = strikes
+        self.skip_seconds = skip_seconds
+        self.stats = {}
+        self.plugins = None
+        self.plugins_at = 0
+        self.lock = threading.Lock()
+
+    def enabled_plugins(self, fetch):
+        """Enabled plugin names, re-read from the WebUI every PLUGIN_LIST_TTL seconds"""
+        if self.plugins is None or time.time() - self.plugins_at > PLUGIN_LIST_TTL:
+            self.plugins = [p['name'] for p in fetch() if p.get('enabled')]
+            self.plugins_at = time.time()
+        return self.plugins
+
+    def record(self, name, latency=None, timeout=False, failed=False):
+        with self.lock:
+            stats = self.stats.setdefault(name, PluginStats())
+            stats.searches += 1
+            if timeout or failed:
+                stats.timeouts += timeout
+                stats.failures += failed
+                stats.strikes += 1
+                if stats.strikes >= self.strikes:
+                    stats.skip_until = time.time() + self.skip_seconds
+                    print(f"⏭️ Search plugin '{name}' keeps failing or timing out, skipping it for {self.skip_seconds}s")
+                return
+            stats.finished += 1
+            stats.strikes = 0
+            stats.avg_latency = latency if stats.avg_latency is None else 0.7 * stats.avg_latency + 0.3 * latency
+
+    def choose(self, names):
+        """Plugins worth asking; all of them when every one is being skipped"""
+        now = time.time()
+        with self.lock:
+            active = [n for n in names if n not in self.stats or self.stats[n].skip_until <= now]
+        return active or list(names)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: stats.to_dict() for name, stats in sorted(self.stats.items())}
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_tracker(name):
+    """Process-wide tracker per WebUI"""
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = PluginTracker()
+        return _trackers[name]
+
+
+def reliability():
+    """Plugin name -> share of its searches that finished in time, over every WebUI"""
+    totals = {}
+    with _trackers_lock:
+        trackers = list(_trackers.values())
+    for tracker in trackers:
+        with tracker.lock:
+            for name, stats in tracker.stats.items():
+                done, total = totals.get(name, (0, 0))
+                totals[name] = (done + stats.finished, total + stats.searches)
+    return {name: done / total for name, (done, total) in totals.items() if total}
+
+
+def snapshot_all():
+    with _trackers_lock:
+        trackers = dict(_trackers)
+    return {name: tracker.snapshot() for name, tracker in trackers.items()}
+
+
+class PluginSearch:
+    """One fan-out search through a QBittorrentAPI (its request() does the calls)"""
+
+    def __init__(self, api, deadline=SEARCH_DEADLINE, quorum=SEARCH_QUORUM, max_jobs=SEARCH_MAX_JOBS):
+        self.api = api
+        self.tracker = get_tracker(api.base_url)
+        self.deadline = deadline
+        self.quorum = quorum
+        self.max_jobs = max_jobs
+
+    def call(self, method, path, priority, **kwargs):
+        response = self.api.request(method, path, priority, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def run(self, query, plugins='all', category='all', priority=PRIORITY_INTERACTIVE):
+        """Results of every plugin that answered in time, each tagged with its plugin"""
+        if plugins in ('all', 'enabled'):
+            names = self.tracker.enabled_plugins(
+                lambda: self.call('GET', '/api/v2/search/plugins', priority).json())
+        else:
+            names = [p.strip() for p in plugins.split(',') if p.strip()]
+        active = self.tracker.choose(names)
+        if not active:
+            return []
+
+        need = max(1, math.ceil(self.quorum * len(active)))
+        deadline = time.monotonic() + self.deadline
+        pending = deque(active)
+        jobs = {}
+        results = []
+        finished = 0
+        try:
+            while (pending or jobs) and finished < need and time.monotonic() < deadline:
+                while pending and len(jobs) < self.max_jobs:
+                    name = pending.popleft()
+                    r = self.api.request('POST', '/api/v2/search/start', priority,
+                                         data={'pattern': query, 'plugins': name, 'category': category})
+                    if r.status_code == 409:
+                        pending.appendleft(name)  # job limit reached (maybe by other users): retry later
+                        break
+                    job_id = r.json().get('id') if r.status_code == 200 else None
+                    if job_id is None:
+                        self.tracker.record(name, failed=True)
+                        continue
+                    jobs[job_id] = (name, time.monotonic())
+
+                time.sleep(max(0, min(SEARCH_POLL, deadline - time.monotonic())))
+                # Status of every job in one call instead of one poll per plugin
+                for status in self.call('GET', '/api/v2/search/status', priority).json():
+                    job = jobs.get(status.get('id'))
+                    if job and status.get('status') == 'Stopped':
+                        del jobs[status['id']]
+                        self.tracker.record(job[0], latency=time.monotonic() - job[1])
+                        results.extend(self.collect(status['id'], job[0], priority))
+                        finished += 1
+        finally:
+            timed_out = time.monotonic() >= deadline
+            for job_id, (name, _) in jobs.items():
+                try:
+                    # Keep whatever a slow plugin found so far
+                    results.extend(self.collect(job_id, name, priority))
+                except Exception:
+                    pass
+                if timed_out:
+                    self.tracker.record(name, timeout=True)
+        return results
+
+    def collect(self, job_id, name, priority):
+        """Fetch a job's results and delete the job (deleting also stops it)"""
+        try:
+            data = self.call('GET', '/api/v2/search/results', priority, params={'id': job_id}).json()
+        finally:
+            self.api.request('POST', '/api/v2/search/delete', priority, data={'id': job_id})
+        results = data.get('results', [])
+        for result in results:
+            result['plugin'] = name
+        return results
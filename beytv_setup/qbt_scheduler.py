@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+BeyTV qBittorrent Call Scheduler - shared, prioritized, rate-limited access
+Every WebUI call goes through one queue so interactive dashboard requests
+jump ahead of status polls and background pushes, and bursts are smoothed
+by a token bucket instead of timing out the WebUI on small machines
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_POLL = 5
+PRIORITY_BACKGROUND = 10
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_POLL: 'poll',
+    PRIORITY_BACKGROUND: 'background',
+}
+
+QBT_RATE = float(os.environ.get('QBT_RATE', '5'))          # calls per second
+QBT_BURST = int(os.environ.get('QBT_BURST', '10'))         # bucket size
+QBT_CONCURRENCY = int(os.environ.get('QBT_CONCURRENCY', '2'))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; take() blocks until a token is available"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class WaitStats:
+    """Queue wait time per priority class"""
+
+    __slots__ = ('calls', 'total_wait', 'max_wait', 'last_wait')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def add(self, wait):
+        self.calls += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.last_wait = wait
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'avg_wait_ms': round(self.total_wait / self.calls * 1000, 2) if self.calls else 0,
+            'max_wait_ms': round(self.max_wait * 1000, 2),
+            'last_wait_ms': round(self.last_wait * 1000, 2),
+        }
+
+
+class CallScheduler:
+    """Priority queue of WebUI calls drained by a few worker threads"""
+
+    def __init__(self, rate=QBT_RATE, burst=QBT_BURST, concurrency=QBT_CONCURRENCY):
+        self.bucket = TokenBucket(rate, burst)
+        self.queue = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.stats = {}
+        for i in range(concurrency):
+            threading.Thread(target=self._worker, name=f'qbt-scheduler-{i}', daemon=True).start()
+
+    def submit(self, fn, priority=PRIORITY_INTERACTIVE):
+        """Queue fn() and return a Future for its result"""
+        future = Future()
+        with self.cond:
+            heapq.heappush(self.queue, (priority, next(self.counter), time.monotonic(), fn, future))
+            self.cond.notify()
+        return future
+
+    def call(self, fn, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """Queue fn() and wait for its result (exceptions are re-raised)"""
+        return self.submit(fn, priority).result(timeout)
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+
+            # Wait for a token first, then pick the most urgent call queued by now
+            self.bucket.take()
+            with self.cond:
+                if not self.queue:
+                    continue
+                priority, _, queued_at, fn, future = heapq.heappop(self.queue)
+                self.stats.setdefault(priority, WaitStats()).add(time.monotonic() - queued_at)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+    def snapshot(self):
+        """Queue depth and wait times, for the status endpoint"""
+        with self.cond:
+            depth = {}
+            for priority, *_ in self.queue:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+            return {
+                'rate_per_sec': self.bucket.rate,
+                'burst': self.bucket.burst,
+                'queued': depth,
+                'wait': {PRIORITY_NAMES.get(p, str(p)): s.to_dict() for p, s in sorted(self.stats.items())},
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name='default'):
+    """Process-wide scheduler per WebUI, shared by every QBittorrentAPI user"""
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = CallScheduler()
+        return _schedulers[name]
+
+
+def snapshot_all():
+    """Snapshot of every scheduler, keyed by WebUI"""
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {name: scheduler.snapshot() for name, scheduler in schedulers.items()}
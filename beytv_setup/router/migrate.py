@@ -0,0 +1,277 @@
+"""
+BeyTV Tier Migration - move completed media between storage tiers
+Moves are queued in SQLite and drained in the background by a few workers:
+seeding torrents are relocated by qBittorrent itself (setLocation), plain
+files are copied kernel-side (copy_file_range / sendfile), verified by
+checksum and only then removed from the source. Copies are throttled and
+resume from the partial file after a restart
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+CHUNK = 8 * 1024 * 1024
+PART_SUFFIX = ".beytv-part"
+
+
+class ByteThrottle:
+    """Token bucket in bytes/second shared by all copy workers (0 = unlimited)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, nbytes):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            self.allowance -= nbytes
+            delay = -self.allowance / self.rate if self.allowance < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+def kernel_copy(src_fd, dst_fd, offset, count):
+    """Copy count bytes at offset without passing data through userspace"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+        except OSError:
+            pass  # e.g. cross-filesystem on older kernels
+    if hasattr(os, "sendfile"):
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        return os.sendfile(dst_fd, src_fd, offset, count)
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.write(dst_fd, os.read(src_fd, count))
+
+
+def file_digest(path, throttle=None):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            if throttle:
+                throttle.consume(len(block))
+            h.update(block)
+    return h.hexdigest()
+
+
+class MigrationQueue:
+    """Persistent queue of pending moves"""
+
+    def __init__(self, path):
+        self.path = path
+        conn = self.connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS moves (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,              -- 'torrent' or 'file'
+                src TEXT NOT NULL,               -- torrent hash or source path
+                dst TEXT NOT NULL,               -- destination directory
+                status TEXT DEFAULT 'pending',   -- pending/running/done/failed
+                bytes_done INTEGER DEFAULT 0,
+                size INTEGER DEFAULT 0,
+                error TEXT,
+                created_at INTEGER,
+                updated_at INTEGER
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, kind, src, dst):
+        now = int(time.time())
+        conn = self.connect()
+        try:
+            with conn:
+                exists = conn.execute(
+                    "SELECT id FROM moves WHERE src = ? AND status IN ('pending', 'running')", (src,)).fetchone()
+                if exists:
+                    return exists["id"]
+                return conn.execute(
+                    "INSERT INTO moves (kind, src, dst, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (kind, src, dst, now, now)).lastrowid
+        finally:
+            conn.close()
+
+    def update(self, move_id, **fields):
+        fields["updated_at"] = int(time.time())
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute("UPDATE moves SET %s WHERE id = ?" % ", ".join(f"{k} = ?" for k in fields),
+                             list(fields.values()) + [move_id])
+        finally:
+            conn.close()
+
+    def claim(self, limit):
+        """Mark up to limit pending moves as running and return them"""
+        conn = self.connect()
+        try:
+            with conn:
+                rows = conn.execute(
+                    "SELECT * FROM moves WHERE status = 'pending' ORDER BY id LIMIT ?", (limit,)).fetchall()
+                for row in rows:
+                    conn.execute("UPDATE moves SET status = 'running', updated_at = ? WHERE id = ?",
+                                 (int(time.time()), row["id"]))
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def resume_interrupted(self):
+        """Moves left 'running' by a crash or restart go back to the queue"""
+        conn = self.connect()
+        try:
+            with conn:
+                return conn.execute("UPDATE moves SET status = 'pending' WHERE status = 'running'").rowcount
+        finally:
+            conn.close()
+
+    def list(self, statuses=("pending", "running", "failed")):
+        conn = self.connect()
+        try:
+            marks = ",".join("?" * len(statuses))
+            return [dict(r) for r in conn.execute(
+                f"SELECT * FROM moves WHERE status IN ({marks}) ORDER BY id", statuses)]
+        finally:
+            conn.close()
+
+
+class Migrator:
+    """Background worker pool draining the MigrationQueue"""
+
+    def __init__(self, queue, qb_call, max_moves=2, max_bytes_per_sec=0, on_done=None):
+        self.queue = queue
+        self.qb_call = qb_call          # qb_call(method, path, **kwargs) -> response
+        self.max_moves = max_moves
+        self.throttle = ByteThrottle(max_bytes_per_sec)
+        self.on_done = on_done          # called with the destination path of each finished move
+
+    def run(self, once=False, poll_interval=10):
+        resumed = self.queue.resume_interrupted()
+        if resumed:
+            print(f"Resuming {resumed} interrupted move(s)")
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.max_moves) as pool:
+            while True:
+                # Claim only as many moves as there are free workers, as soon as one frees up
+                free = self.max_moves - len(running)
+                moves = self.queue.claim(free) if free else []
+                running.update(pool.submit(self.process, move) for move in moves)
+                if not running:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                # With a worker idle, wake up after poll_interval anyway to pick up new moves
+                _, running = wait(running, timeout=None if len(running) >= self.max_moves else poll_interval,
+                                  return_when=FIRST_COMPLETED)
+
+    def process(self, move):
+        try:
+            if move["kind"] == "torrent":
+                dest = self.move_torrent(move)
+            else:
+                dest = self.move_path(move)
+            self.queue.update(move["id"], status="done", error=None)
+            print(f"✅ Moved {move['src']} → {move['dst']}")
+            if self.on_done:
+                self.on_done(dest)
+        except Exception as e:
+            self.queue.update(move["id"], status="failed", error=str(e))
+            print(f"❌ Move {move['src']} failed: {e}")
+
+    def move_torrent(self, move, timeout=6 * 3600):
+        """Let qBittorrent relocate a seeding torrent and wait until it is done"""
+        r = self.qb_call("POST", "/api/v2/torrents/setLocation",
+                         data={"hashes": move["src"], "location": move["dst"]})
+        if r.status_code != 200:
+            raise RuntimeError(f"setLocation returned {r.status_code}: {r.text}")
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            info = self.qb_call("GET", "/api/v2/torrents/info", params={"hashes": move["src"]}).json()
+            if not info:
+                raise RuntimeError("torrent no longer exists")
+            torrent = info[0]
+            if torrent.get("state") != "moving" and os.path.normpath(torrent.get("save_path", "")) == os.path.normpath(move["dst"]):
+                return os.path.join(move["dst"], torrent.get("name", ""))
+            time.sleep(5)
+        raise RuntimeError("timed out waiting for qBittorrent to move data")
+
+    def move_path(self, move):
+        """Copy a file or directory tree, verify, then delete the source"""
+        src = move["src"].rstrip(os.sep)
+        dest = os.path.join(move["dst"], os.path.basename(src))
+        if os.path.isdir(src):
+            files = []
+            for root, _, names in os.walk(src):
+                for name in names:
+                    path = os.path.join(root, name)
+                    files.append((path, os.path.join(dest, os.path.relpath(path, src))))
+        elif os.path.exists(src):
+            files = [(src, dest)]
+        else:
+            raise RuntimeError("source missing")
+
+        total = sum(os.path.getsize(s) for s, _ in files)
+        self.queue.update(move["id"], size=total)
+        done = 0
+        for file_src, file_dst in files:
+            done = self.copy_file(move, file_src, file_dst, done)
+
+        # Everything verified: now it is safe to drop the source
+        if os.path.isdir(src):
+            shutil.rmtree(src)
+        else:
+            os.remove(src)
+        return dest
+
+    def copy_file(self, move, src, dst, done):
+        size = os.path.getsize(src)
+        if os.path.exists(dst) and os.path.getsize(dst) == size and \
+                file_digest(dst, self.throttle) == file_digest(src, self.throttle):
+            return done + size  # finished before a restart
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        part = dst + PART_SUFFIX
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset > size:
+            offset = 0
+        src_fd = os.open(src, os.O_RDONLY)
+        dst_fd = os.open(part, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(dst_fd, offset)
+            while offset < size:
+                count = min(CHUNK, size - offset)
+                self.throttle.consume(count)
+                copied = kernel_copy(src_fd, dst_fd, offset, count)
+                if not copied:
+                    raise RuntimeError(f"short copy of {src}")
+                offset += copied
+                self.queue.update(move["id"], bytes_done=done + offset)
+            os.fsync(dst_fd)
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+
+        if file_digest(part, self.throttle) != file_digest(src, self.throttle):
+            os.remove(part)
+            raise RuntimeError(f"checksum mismatch for {src}")
+        shutil.copystat(src, part)
+        os.replace(part, dst)
+        return done + size
@@ -0,0 +1,132 @@
+"""
+BeyTV Storage Placement - choose a storage tier for each new download
+Rules are evaluated in order ("new TV on SSD, movies over 20 GB on HDD"),
+then checked against the free space on the chosen tier
+"""
+
+import os
+import re
+import sys
+import shutil
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# Shared BeyTV modules live one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from feeds import parse_size as parse_size_text
+from rules import parse_episode
+
+SEASON_RE = re.compile(r'\bseason\b', re.IGNORECASE)
+RULE_RE = re.compile(r'^\s*(\w+|\*)\s*(?:([<>])\s*([\d.]+\s*(?:[KMGT]i?B)?))?\s*=\s*(\w+)\s*$', re.IGNORECASE)
+
+# type[>size|<size]=tier, first match wins
+DEFAULT_RULES = "tv=ssd;movie>20GB=hdd;movie=ssd;*=hdd"
+DEFAULT_MIN_FREE = "10GB"
+
+
+def parse_size(text):
+    """'20GB' / '700 MiB' / '1234' -> bytes; ValueError when it is not a size"""
+    text = str(text or '').strip()
+    if text.isdigit():
+        return int(text)
+    size = parse_size_text(text)
+    if not size:
+        raise ValueError(f"Invalid size: {text}")
+    return size
+
+
+def parse_rules(text):
+    """Parse 'tv=ssd;movie>20GB=hdd' into (type, op, size, tier, text) tuples"""
+    rules = []
+    for part in filter(None, (p.strip() for p in text.split(';'))):
+        match = RULE_RE.match(part)
+        if not match:
+            raise ValueError(f"Invalid placement rule: {part}")
+        kind, op, size, tier = match.groups()
+        rules.append((kind.lower(), op, parse_size(size) if size else 0, tier.lower(), part))
+    return rules
+
+
+def content_type(title):
+    return "tv" if parse_episode(title) or SEASON_RE.search(title or '') else "movie"
+
+
+def magnet_info(url):
+    """Title (dn) and exact length (xl) from a magnet link when present"""
+    if not url.startswith("magnet:"):
+        return "", 0
+    params = parse_qs(urlparse(url).query)
+    title = params.get("dn", [""])[0]
+    try:
+        size = int(params.get("xl", ["0"])[0])
+    except ValueError:
+        size = 0
+    return title, size
+
+
+def env_tiers():
+    """Tier name -> path from SSD_PATH / HDD_PATH / CLOUD_PATH, in preference order"""
+    return {"ssd": os.getenv("SSD_PATH", "/mnt/ssd_media"),
+            "hdd": os.getenv("HDD_PATH", "/mnt/hdd_media"),
+            "cloud": os.getenv("CLOUD_PATH", "/mnt/cloud_media")}
+
+
+def free_space(path):
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+
+class PlacementPolicy:
+    """Picks a tier path per download from rules, size and free space"""
+
+    def __init__(self, tiers, rules=None, min_free=None):
+        self.tiers = tiers  # name -> path, in preference order
+        self.rules = parse_rules(rules or os.getenv("PLACEMENT_RULES", DEFAULT_RULES))
+        self.min_free = parse_size(min_free or os.getenv("PLACEMENT_MIN_FREE", DEFAULT_MIN_FREE))
+
+    def fits(self, tier, size):
+        path = self.tiers.get(tier)
+        if not path or not os.path.exists(path):
+            return False
+        return free_space(path) - size >= self.min_free
+
+    def choose(self, title, size=0, kind=None):
+        """Return (tier, path, reason)"""
+        kind = kind or content_type(title)
+        for rule_kind, op, limit, tier, text in self.rules:
+            if rule_kind not in ("*", kind):
+                continue
+            if op == ">" and not size > limit:
+                continue
+            if op == "<" and not (size and size < limit):
+                continue
+            if self.fits(tier, size):
+                return tier, self.tiers[tier], f"rule {text}"
+            # Preferred tier is full (or missing); try the next matching rule
+        # No rule fits: fall back to the tier with the most free space
+        candidates = [t for t in self.tiers if self.fits(t, size)]
+        if not candidates:
+            raise RuntimeError(f"No storage tier has room for {size} bytes")
+        tier = max(candidates, key=lambda t: free_space(self.tiers[t]))
+        return tier, self.tiers[tier], "most free space"
+
+
+def placement_path(url, title=None, size=0, save_path=None, tiers=None):
+    """Save path for a new torrent: save_path when given, else the tier chosen by
+    the placement rules. None (qBittorrent's default) when no tier exists here."""
+    if save_path:
+        return save_path
+    tiers = tiers or env_tiers()
+    if not any(os.path.exists(path) for path in tiers.values()):
+        return None
+    magnet_title, magnet_size = magnet_info(url or "")
+    title = title or magnet_title or url
+    try:
+        tier, path, reason = PlacementPolicy(tiers).choose(title, size or magnet_size)
+    except (RuntimeError, ValueError) as e:
+        print("Placement failed:", e)
+        return None
+    print(f"{title} → {tier.upper()} ({path}) [{reason}]")
+    return path
@@ -0,0 +1,127 @@
+"""
+BeyTV Plex Refresh - targeted, debounced library scans
+Completed paths are mapped to the Plex section that contains them and
+scanned with the partial-scan endpoint (/library/sections/<id>/refresh?path=).
+Completions arriving within one window are merged into a single scan per
+folder instead of rescanning the whole library each time
+"""
+
+import os
+import time
+import threading
+import xml.etree.ElementTree as ET
+import requests
+
+SECTIONS_TTL = 600
+MEDIA_EXTS = {".mkv", ".mp4", ".avi", ".m4v", ".mov", ".ts", ".wmv", ".srt", ".mp3", ".flac"}
+
+
+def is_within(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def collapse(folders):
+    """Drop folders already covered by a pending parent folder"""
+    kept = []
+    for folder in sorted(set(folders)):
+        if not any(is_within(folder, parent) for parent in kept):
+            kept.append(folder)
+    return kept
+
+
+class PlexRefresher:
+    """Collects completed paths and flushes them as per-folder partial scans"""
+
+    def __init__(self, url, token, window=30, path_map=None):
+        self.url = (url or "").rstrip("/")
+        self.token = token
+        self.window = window
+        self.path_map = path_map or {}  # tier path -> path Plex sees (mergerfs union)
+        self.pending = set()
+        self.timer = None
+        self.lock = threading.Lock()
+        self.sections = []
+        self.sections_at = 0
+
+    def plex_path(self, path):
+        """Translate a path on a tier into the path Plex sees"""
+        path = os.path.normpath(path)
+        for tier_path, plex_root in self.path_map.items():
+            tier_path = os.path.normpath(tier_path)
+            if is_within(path, tier_path):
+                return os.path.normpath(plex_root + path[len(tier_path):])
+        return path
+
+    def load_sections(self, force=False):
+        """[(section_id, title, [locations])] from /library/sections, cached"""
+        if not force and self.sections and time.time() - self.sections_at < SECTIONS_TTL:
+            return self.sections
+        r = requests.get(f"{self.url}/library/sections", params={"X-Plex-Token": self.token}, timeout=10)
+        r.raise_for_status()
+        sections = []
+        for directory in ET.fromstring(r.content).iter("Directory"):
+            locations = [os.path.normpath(loc.get("path")) for loc in directory.iter("Location") if loc.get("path")]
+            sections.append((directory.get("key"), directory.get("title", ""), locations))
+        self.sections, self.sections_at = sections, time.time()
+        return sections
+
+    def targets(self, folder):
+        """[(section_id, scan_path)] covering folder"""
+        targets = []
+        for key, _, locations in self.load_sections():
+            for location in locations:
+                if is_within(folder, location):
+                    targets.append((key, folder))
+                elif is_within(location, folder):
+                    # folder is above the section root (e.g. a whole tier)
+                    targets.append((key, location))
+        return targets
+
+    def queue(self, path):
+        """Schedule a scan for the folder holding path; merged within the window"""
+        if not self.token:
+            return
+        folder = self.plex_path(path)
+        if os.path.isfile(path) or os.path.splitext(path)[1].lower() in MEDIA_EXTS:
+            folder = os.path.dirname(folder)  # a single file: scan its folder
+        with self.lock:
+            self.pending.add(folder)
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            folders, self.pending = self.pending, set()
+            self.timer = None
+        return self.refresh(folders)
+
+    def refresh(self, folders):
+        """Run one partial scan per folder now, returns the scans issued"""
+        if not self.token:
+            return []
+        try:
+            scans = {target for folder in collapse(folders) for target in self.targets(folder)}
+        except (requests.RequestException, ET.ParseError) as e:
+            print("Plex refresh failed:", e)
+            return []
+        if not scans and folders:
+            print(f"No Plex section covers {', '.join(sorted(folders))}")
+        for key, path in sorted(scans):
+            try:
+                r = requests.get(f"{self.url}/library/sections/{key}/refresh",
+                                 params={"path": path, "X-Plex-Token": self.token}, timeout=10)
+                r.raise_for_status()
+                print(f"Triggered Plex scan of section {key}: {path}")
+            except requests.RequestException as e:
+                print(f"Plex scan of {path} failed:", e)
+        return sorted(scans)
+
+    def close(self):
+        """Flush anything still waiting for its window"""
+        with self.lock:
+            timer = self.timer
+        if timer:
+            timer.cancel()
+            self.flush()
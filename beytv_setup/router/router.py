@@ -1,5 +1,8 @@
-import os, subprocess, json, requests, argparse
+import os, time, subprocess, json, requests, argparse
 from dotenv import load_dotenv
+from placement import PlacementPolicy, magnet_info, parse_size
+from migrate import MigrationQueue, Migrator
+from plex_refresh import PlexRefresher
 
 load_dotenv()
 
@@ -12,8 +15,15 @@ QB_USER = os.getenv("QB_USER")
 QB_PASS = os.getenv("QB_PASS")
 PLEX_URL = os.getenv("PLEX_URL")
 PLEX_TOKEN = os.getenv("PLEX_TOKEN")
+MIGRATION_DB = os.getenv("MIGRATION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations.db"))
+MIGRATE_CONCURRENCY = int(os.getenv("MIGRATE_CONCURRENCY", "2"))
+MIGRATE_MAX_MBPS = float(os.getenv("MIGRATE_MAX_MBPS", "0"))  # 0 = unthrottled
+MIGRATE_AFTER_DAYS = float(os.getenv("MIGRATE_AFTER_DAYS", "14"))
+PLEX_REFRESH_WINDOW = float(os.getenv("PLEX_REFRESH_WINDOW", "30"))
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "15"))
 
 session = requests.Session()
+_refresher = None
 
 def qb_login():
     r = session.post(f"{QB_URL}/api/v2/auth/login", data={"username": QB_USER, "password": QB_PASS}, timeout=10)
@@ -23,16 +33,142 @@ def qb_set_savepath(path):
     if not qb_login():
         print("qB login failed")
         return
-    r = session.post(f"{QB_URL}/api/v2/app/setPreferences", data={"json": json.dumps({"save_path": path})})
+    r = session.post(f"{QB_URL}/api/v2/app/setPreferences", data={"json": json.dumps({"save_path": path})}, timeout=10)
     print("qBittorrent save_path set to", path)
 
-def plex_refresh():
+def qb_add(url, savepath):
+    """Add a torrent with a per-torrent save path (global preference untouched)"""
+    if not qb_login():
+        print("qB login failed")
+        return False
+    r = session.post(f"{QB_URL}/api/v2/torrents/add", data={"urls": url, "savepath": savepath}, timeout=15)
+    return r.status_code == 200 and "Fails" not in r.text
+
+def qb_call(method, path, **kwargs):
+    """WebUI call that logs in again once when the session cookie expired"""
+    kwargs.setdefault("timeout", 15)
+    r = session.request(method, f"{QB_URL}{path}", **kwargs)
+    if r.status_code == 403 and qb_login():
+        r = session.request(method, f"{QB_URL}{path}", **kwargs)
+    return r
+
+def tiers():
+    return {"ssd": SSD_PATH, "hdd": HDD_PATH, "cloud": CLOUD_PATH}
+
+def add_download(url, title=None, size=None, kind=None, dry_run=False):
+    """Pick a tier for one download and add it to qBittorrent there"""
+    magnet_title, magnet_size = magnet_info(url)
+    title = title or magnet_title or url
+    size = parse_size(size) if size else magnet_size
+    try:
+        tier, path, reason = PlacementPolicy(tiers()).choose(title, size, kind)
+    except (RuntimeError, ValueError) as e:
+        print("Placement failed:", e)
+        return
+    print(f"{title} → {tier.upper()} ({path}) [{reason}]")
+    if dry_run:
+        return
+    if qb_add(url, path):
+        print("Added to qBittorrent")
+    else:
+        print("qBittorrent add failed")
+
+def migrator():
+    return Migrator(MigrationQueue(MIGRATION_DB), qb_call, MIGRATE_CONCURRENCY,
+                    int(MIGRATE_MAX_MBPS * 1024 * 1024), on_done=refresher().queue)
+
+def tier_path(target):
+    path = tiers().get(target)
+    if not path:
+        raise ValueError(f"Invalid target: {target}")
+    return path
+
+def queue_migration(src, target, torrent=False):
+    """Queue a move of a torrent (by hash) or a file/folder to another tier"""
+    try:
+        dst = tier_path(target)
+    except ValueError as e:
+        print(e)
+        return
+    move_id = MigrationQueue(MIGRATION_DB).add("torrent" if torrent else "file", src, dst)
+    print(f"Queued move #{move_id}: {src} → {target.upper()} ({dst})")
+
+def scan_migrations(source="ssd", target="hdd", older_than_days=MIGRATE_AFTER_DAYS):
+    """Queue completed torrents that have sat on the source tier long enough"""
+    src, dst = os.path.normpath(tier_path(source)), tier_path(target)
+    if not qb_login():
+        print("qB login failed")
+        return
+    cutoff = time.time() - older_than_days * 86400
+    queue = MigrationQueue(MIGRATION_DB)
+    queued = 0
+    for t in qb_call("GET", "/api/v2/torrents/info", params={"filter": "completed"}).json():
+        save_path = os.path.normpath(t.get("save_path", ""))
+        if save_path != src and not save_path.startswith(src + os.sep):
+            continue
+        if 0 < t.get("completion_on", 0) < cutoff:
+            queue.add("torrent", t["hash"], dst)
+            queued += 1
+    print(f"Queued {queued} torrent(s) older than {older_than_days:g} days for {source.upper()} → {target.upper()}")
+
+def migration_status():
+    moves = MigrationQueue(MIGRATION_DB).list()
+    if not moves:
+        print("No pending moves")
+    for m in moves:
+        progress = f" {m['bytes_done'] * 100 // m['size']}%" if m["size"] else ""
+        error = f" ({m['error']})" if m["error"] else ""
+        print(f"#{m['id']} {m['status']}{progress} {m['kind']} {m['src']} → {m['dst']}{error}")
+
+def run_migrations(once=False):
+    try:
+        logged_in = qb_login()
+    except requests.RequestException:
+        logged_in = False
+    if not logged_in:
+        print("qB login failed, torrent moves will fail until it is reachable")
+    migrator().run(once=once)
+    refresher().close()
+
+def refresher():
+    """Process-wide Plex refresh coordinator; tier paths map onto the union Plex scans"""
+    global _refresher
+    if _refresher is None:
+        path_map = {path: UNION_PATH for path in tiers().values()}
+        _refresher = PlexRefresher(PLEX_URL, PLEX_TOKEN, PLEX_REFRESH_WINDOW, path_map)
+    return _refresher
+
+def plex_refresh(*paths):
+    """Scan only the Plex sections/folders containing paths, right away"""
     if not PLEX_TOKEN: return
+    # Plex scans folders: a moved single-file torrent refreshes its parent
+    folders = (os.path.dirname(p) if os.path.isfile(p) else p for p in paths)
+    refresher().refresh({refresher().plex_path(p) for p in folders})
+
+def watch_completions():
+    """Queue a debounced Plex scan for every torrent qBittorrent completes"""
+    if not qb_login():
+        print("qB login failed")
+        return
+    since = time.time()
+    print(f"Watching qBittorrent for completed downloads every {WATCH_INTERVAL:g}s")
     try:
-        requests.post(f"{PLEX_URL}/library/all/refresh?X-Plex-Token={PLEX_TOKEN}", timeout=10)
-        print("Triggered Plex refresh.")
-    except Exception as e:
-        print("Plex refresh failed:", e)
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            try:
+                torrents = qb_call("GET", "/api/v2/torrents/info", params={"filter": "completed"}).json()
+            except (requests.RequestException, ValueError) as e:
+                print("qBittorrent poll failed:", e)
+                continue
+            newest = since
+            for t in torrents:
+                done_at = t.get("completion_on", 0)
+                if done_at > since:
+                    refresher().queue(t.get("content_path") or os.path.join(t.get("save_path", ""), t.get("name", "")))
+                    newest = max(newest, done_at)
+            since = newest
+    except KeyboardInterrupt:
+        refresher().close()
 
 def list_storages():
     for name, path in {"ssd": SSD_PATH, "hdd": HDD_PATH, "cloud": CLOUD_PATH}.items():
@@ -47,17 +183,45 @@ def set_storage(target):
         # ensure cloud mounted
         subprocess.run(["rclone", "mount", os.getenv("RCLONE_REMOTE_GDRIVE", "gdrive:"), CLOUD_PATH, "--daemon"], check=False)
     qb_set_savepath(path)
-    plex_refresh()
+    plex_refresh(path)
     print(f"Active storage switched to {target.upper()} ({path})")
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--list", action="store_true")
     p.add_argument("--set", choices=["ssd","hdd","cloud"])
+    p.add_argument("--add", metavar="URL", help="add a torrent on the tier chosen by PLACEMENT_RULES")
+    p.add_argument("--title")
+    p.add_argument("--size", help="expected size, e.g. 4GB (read from magnet xl= when omitted)")
+    p.add_argument("--type", choices=["tv","movie"])
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--migrate", metavar="PATH", help="queue a move of a file or folder to --to")
+    p.add_argument("--migrate-torrent", metavar="HASH", help="queue a move of a seeding torrent to --to")
+    p.add_argument("--migrate-scan", action="store_true", help="queue SSD torrents older than MIGRATE_AFTER_DAYS for HDD")
+    p.add_argument("--migrate-worker", action="store_true", help="run queued moves in the background")
+    p.add_argument("--migrate-status", action="store_true")
+    p.add_argument("--once", action="store_true", help="with --migrate-worker: exit when the queue is empty")
+    p.add_argument("--to", choices=["ssd","hdd","cloud"])
+    p.add_argument("--refresh", metavar="PATH", nargs="+", help="scan only the Plex folders containing PATH")
+    p.add_argument("--watch", action="store_true", help="scan Plex folders as qBittorrent completes downloads")
     args = p.parse_args()
     if args.list:
         list_storages()
     elif args.set:
         set_storage(args.set)
+    elif args.add:
+        add_download(args.add, args.title, args.size, args.type, args.dry_run)
+    elif (args.migrate or args.migrate_torrent) and args.to:
+        queue_migration(args.migrate or args.migrate_torrent, args.to, torrent=bool(args.migrate_torrent))
+    elif args.migrate_scan:
+        scan_migrations()
+    elif args.migrate_worker:
+        run_migrations(once=args.once)
+    elif args.migrate_status:
+        migration_status()
+    elif args.refresh:
+        plex_refresh(*args.refresh)
+    elif args.watch:
+        watch_completions()
     else:
         p.print_help()
@@ -1,13 +1,23 @@
 import os
 import re
+import io
 import csv
 import time
+import hashlib
+import argparse
+import threading
 import requests
 from pathlib import Path
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 from plexapi.server import PlexServer
 from feedgen.feed import FeedGenerator
+from qbt_scheduler import TokenBucket
+from plex_recent import recently_added, added_at
+from plex_webhooks import parse_webhook
+from omdb_cache import OMDbCache, DEFAULT_DB as OMDB_CACHE_DEFAULT_DB, id_key, title_key
 
 load_dotenv()
 
@@ -17,25 +27,35 @@ PLEX_TOKEN = os.getenv("PLEX_TOKEN")
 LIBRARY_TYPE = os.getenv("LIBRARY_TYPE", "both").lower()
 MAX_ITEMS = int(os.getenv("MAX_ITEMS", "50"))
 
+# OMDb enrichment: parallel lookups kept under the plan's request rate
+OMDB_WORKERS = int(os.getenv("OMDB_WORKERS", "8"))
+OMDB_RATE = float(os.getenv("OMDB_RATE", "5"))       # requests per second
+OMDB_BURST = int(os.getenv("OMDB_BURST", "10"))
+OMDB_RETRIES = int(os.getenv("OMDB_RETRIES", "3"))
+OMDB_TIMEOUT = float(os.getenv("OMDB_TIMEOUT", "15"))
+OMDB_DEADLINE = float(os.getenv("OMDB_DEADLINE", "60"))  # seconds for the whole run
+RATINGS_HOST = os.getenv("RATINGS_HOST", "0.0.0.0")
+RATINGS_PORT = int(os.getenv("RATINGS_PORT", "8088"))
+REBUILD_DELAY = float(os.getenv("REBUILD_DELAY", "5"))  # seconds to gather a burst of webhooks
+OMDB_CACHE_DB = os.getenv("OMDB_CACHE_DB", OMDB_CACHE_DEFAULT_DB)
+OMDB_CACHE_TTL_DAYS = float(os.getenv("OMDB_CACHE_TTL_DAYS", "7"))
+OMDB_NEGATIVE_TTL_HOURS = float(os.getenv("OMDB_NEGATIVE_TTL_HOURS", "24"))
+
 assert OMDB_API_KEY, "OMDB_API_KEY missing"
 assert PLEX_TOKEN, "PLEX_TOKEN missing"
 
 session = requests.Session()
+omdb_bucket = TokenBucket(OMDB_RATE, OMDB_BURST)
+omdb_cache = OMDbCache(OMDB_CACHE_DB, OMDB_CACHE_TTL_DAYS * 86400, OMDB_NEGATIVE_TTL_HOURS * 3600)
 
 def plex_connect():
     return PlexServer(PLEX_URL, PLEX_TOKEN)
 
+def library_types():
+    return {"both": ("movie", "show")}.get(LIBRARY_TYPE, (LIBRARY_TYPE,))
+
 def get_recent(plex):
-    items = []
-    sections = plex.library.sections()
-    for s in sections:
-        if LIBRARY_TYPE in ("both", "movie") and s.type == "movie":
-            items.extend(s.recentlyAdded() or [])
-        if LIBRARY_TYPE in ("both", "show") and s.type == "show":
-            items.extend(s.recentlyAdded() or [])
-    # sort by addedAt desc and truncate
-    items.sort(key=lambda x: getattr(x, "addedAt", 0), reverse=True)
-    return items[:MAX_ITEMS]
+    return recently_added(plex, MAX_ITEMS, library_types())
 
 IMDB_RE = re.compile(r"(tt\d+)")
 
@@ -50,21 +70,48 @@ def extract_imdb_id(item):
         pass
     return None
 
-def omdb_lookup_by_id(imdb_id):
-    q = {"i": imdb_id, "apikey": OMDB_API_KEY}
-    r = session.get("http://www.omdbapi.com/", params=q, timeout=15)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-def omdb_lookup_by_title(title, year=None):
-    q = {"t": title, "apikey": OMDB_API_KEY}
-    if year:
-        q["y"] = str(year)
-    r = session.get("http://www.omdbapi.com/", params=q, timeout=15)
-    if r.status_code != 200:
-        return None
-    return r.json()
+def omdb_get(q, deadline=None):
+    """Rate-limited OMDb request with retries and exponential backoff"""
+    deadline = deadline or time.time() + OMDB_TIMEOUT * (OMDB_RETRIES + 1)
+    for attempt in range(OMDB_RETRIES + 1):
+        if time.time() >= deadline:
+            return None
+        omdb_bucket.take()
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        try:
+            r = session.get("http://www.omdbapi.com/", params=q, timeout=min(OMDB_TIMEOUT, remaining))
+            if r.status_code == 200:
+                return r.json()
+            if r.status_code not in (429, 500, 502, 503, 504):
+                return None
+        except (requests.RequestException, ValueError):
+            pass
+        delay = 0.5 * 2 ** attempt
+        if time.time() + delay >= deadline:
+            return None
+        time.sleep(delay)
+    return None
+
+def omdb_lookup_by_id(imdb_id, deadline=None):
+    key = id_key(imdb_id)
+    data = omdb_cache.get(key)
+    if data is None:
+        data = omdb_get({"i": imdb_id, "apikey": OMDB_API_KEY}, deadline)
+        omdb_cache.put(data, key)
+    return data
+
+def omdb_lookup_by_title(title, year=None, deadline=None):
+    key = title_key(title, year)
+    data = omdb_cache.get(key)
+    if data is None:
+        q = {"t": title, "apikey": OMDB_API_KEY}
+        if year:
+            q["y"] = str(year)
+        data = omdb_get(q, deadline)
+        omdb_cache.put(data, key)
+    return data
 
 def ratings_from_omdb(data):
     out = {"imdb":"", "rt":"", "metacritic":""}
@@ -84,6 +131,38 @@ def ratings_from_omdb(data):
             out["metacritic"] = val
     return out
 
+def lookup_ratings(it, deadline):
+    title = getattr(it, "title", "Unknown")
+    year = getattr(it, "year", None)
+    imdb_id = extract_imdb_id(it)
+    data = omdb_lookup_by_id(imdb_id, deadline) if imdb_id else omdb_lookup_by_title(title, year, deadline)
+    return ratings_from_omdb(data)
+
+def enrich(items):
+    """Look up ratings for all items in parallel; results keep the input order.
+    Items still unresolved at the run deadline (or whose lookup failed) get None."""
+    deadline = time.time() + OMDB_DEADLINE
+    pool = ThreadPoolExecutor(max_workers=OMDB_WORKERS)
+    futures = [pool.submit(lookup_ratings, it, deadline) for it in items]
+    results, missed = [], 0
+    for f in futures:
+        try:
+            results.append(f.result(timeout=max(deadline - time.time(), 0)))
+        except FutureTimeout:
+            missed += 1
+            results.append(None)
+        except Exception as e:
+            print("OMDb lookup failed:", e)
+            results.append(None)
+    # Lookups not started by the deadline are dropped (cancel_futures needs Python 3.9)
+    for f in futures:
+        f.cancel()
+    pool.shutdown(wait=False)
+    print(f"OMDb cache: {omdb_cache.hits} hit(s), {omdb_cache.misses} miss(es)")
+    if missed:
+        print(f"OMDb deadline reached, {missed} item(s) left without ratings")
+    return results
+
 def build_feed(items, rows):
     fg = FeedGenerator()
     fg.title("BeyTV Ratings Feed")
@@ -105,54 +184,271 @@ def build_feed(items, rows):
         fe.description(rating_str)
     return fg
 
-def main():
-    plex = plex_connect()
-    items = get_recent(plex)
+# rated_at: when OMDb last answered for the row (0 = never, e.g. the run deadline hit)
+CSV_FIELDS = ["title","imdb","rt","metacritic","plex_url","added_at","rated_at"]
 
-    rows = []
-    for it in items:
-        title = getattr(it, "title", "Unknown")
-        year = getattr(it, "year", None)
-        imdb_id = extract_imdb_id(it)
-        data = omdb_lookup_by_id(imdb_id) if imdb_id else omdb_lookup_by_title(title, year)
-        r = ratings_from_omdb(data)
-        rows.append({
-            "title": title if not year else f"{title} ({year})",
-            "imdb": r["imdb"],
-            "rt": r["rt"],
-            "metacritic": r["metacritic"],
-            "plex_url": f"{PLEX_URL}/web/index.html#!/server/{plex.machineIdentifier}/details?key={getattr(it, 'key', '')}"
-        })
-
-    outdir = Path("public")
-    outdir.mkdir(parents=True, exist_ok=True)
-
-    # CSV
-    with open(outdir/"ratings.csv", "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["title","imdb","rt","metacritic","plex_url"])
-        w.writeheader()
-        w.writerows(rows)
-
-    # RSS
-    fg = build_feed(items, rows)
-    fg.rss_file(outdir/"rss.xml")
-
-    # Minimal HTML viewer
-    html = '''<!doctype html>
+HTML_PAGE = '''<!doctype html>
 <html><head><meta charset="utf-8"><title>BeyTV Ratings</title>
 <style>body{font-family:system-ui, sans-serif;max-width:900px;margin:24px auto;padding:0 16px}
-table{border-collapse:collapse;width:100%}th,td{border:1px solid #ddd;padding:8px}th{background:#f5f5f5;text-align:left}
+table{border-collapse:collapse;width:100%%}th,td{border:1px solid #ddd;padding:8px}th{background:#f5f5f5;text-align:left}
 </style></head><body>
 <h1>BeyTV Ratings</h1>
 <p>Generated from Plex + OMDb. Use the <a href="rss.xml">RSS</a> in any reader.</p>
 <table><thead><tr><th>Title</th><th>IMDb</th><th>Rotten Tomatoes</th><th>Metacritic</th></tr></thead><tbody>
 %s
 </tbody></table></body></html>'''
+
+# Section type -> Plex item type listed as recently added (shows list their episodes)
+RECENT_ITEM_TYPES = {"movie": 1, "show": 4}
+
+def newest_added():
+    """(addedAt, key) of the newest item in the generated library types, one small
+    request per section (None if unknown)"""
+    headers = {"Accept": "application/json", "X-Plex-Token": PLEX_TOKEN}
+    newest = (0, "")
+    try:
+        r = session.get(f"{PLEX_URL}/library/sections", headers=headers, timeout=10)
+        r.raise_for_status()
+        types = library_types()
+        for section in r.json().get("MediaContainer", {}).get("Directory") or []:
+            if section.get("type") not in types:
+                continue
+            r = session.get(f"{PLEX_URL}/library/sections/{section['key']}/all",
+                            params={"type": RECENT_ITEM_TYPES.get(section["type"], 1), "sort": "addedAt:desc"},
+                            headers=dict(headers, **{"X-Plex-Container-Start": "0", "X-Plex-Container-Size": "1"}),
+                            timeout=10)
+            r.raise_for_status()
+            metadata = r.json().get("MediaContainer", {}).get("Metadata") or []
+            if metadata:
+                newest = max(newest, (int(metadata[0].get("addedAt", 0)), metadata[0].get("key", "")))
+        return newest
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+def load_rows(outdir):
+    """Rows of the previous run's ratings.csv, newest first ([] if missing or from an older format)"""
+    try:
+        with open(outdir/"ratings.csv", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            if "added_at" not in (reader.fieldnames or []):
+                return []
+            rows = list(reader)
+    except FileNotFoundError:
+        return []
+    for row in rows:
+        row["added_at"] = int(row["added_at"] or 0)
+        row["rated_at"] = int(row.get("rated_at") or 0)
+    return rows
+
+def render_csv(rows):
+    buf = io.StringIO(newline="")
+    w = csv.DictWriter(buf, fieldnames=CSV_FIELDS)
+    w.writeheader()
+    w.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+def render_html(rows):
     rows_html = "\n".join([f"<tr><td>{r['title']}</td><td>{r['imdb']}</td><td>{r['rt']}</td><td>{r['metacritic']}</td></tr>" for r in rows])
-    with open(outdir/"index.html","w",encoding="utf-8") as f:
-        f.write(html % rows_html)
+    return (HTML_PAGE % rows_html).encode("utf-8")
+
+def render_outputs(rows):
+    """File name -> (content type, body bytes)"""
+    return {
+        "ratings.csv": ("text/csv; charset=utf-8", render_csv(rows)),
+        "rss.xml": ("application/rss+xml; charset=utf-8", build_feed(None, rows).rss_str(pretty=True)),
+        "index.html": ("text/html; charset=utf-8", render_html(rows)),
+    }
+
+def write_atomic(path, data):
+    """Write via a temp file and rename, so readers never see a half-written file"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_outputs(outdir, outputs):
+    for name, (_, body) in outputs.items():
+        write_atomic(outdir/name, body)
+
+RATING_FIELDS = ("imdb", "rt", "metacritic")
+
+def has_ratings(row):
+    return any(row[k] for k in RATING_FIELDS)
+
+def ratings_due(row, now=None):
+    """A row without ratings is asked again once OMDb's negative answer expired"""
+    if has_ratings(row):
+        return False
+    now = time.time() if now is None else now
+    return now - row.get("rated_at", 0) >= OMDB_NEGATIVE_TTL_HOURS * 3600
+
+def plex_url(plex, it):
+    return f"{PLEX_URL}/web/index.html#!/server/{plex.machineIdentifier}/details?key={getattr(it, 'key', '')}"
+
+def update_rows(plex, previous, watermark):
+    """Enrich items added at or after watermark that are not in previous rows yet,
+    plus previous rows whose missing ratings are due for another try (see ratings_due),
+    and merge them into previous rows. Returns (rows, number of new or re-checked items)."""
+    known = {row["plex_url"]: row for row in previous}
+    now = int(time.time())
+    items = []
+    for it in get_recent(plex):
+        row = known.get(plex_url(plex, it))
+        # >=: items added in the same second as the watermark are still picked up
+        if (row is None and added_at(it) >= watermark) or (row is not None and ratings_due(row, now)):
+            items.append(it)
+    if not items:
+        return previous, 0
+
+    omdb_cache.prune()
+    updated = {}
+    for it, r in zip(items, enrich(items)):
+        url = plex_url(plex, it)
+        if r is None and url in known:
+            continue  # no answer this time, keep the previous row as it is
+        title = getattr(it, "title", "Unknown")
+        year = getattr(it, "year", None)
+        updated[url] = {
+            "title": title if not year else f"{title} ({year})",
+            **(r or ratings_from_omdb(None)),
+            "plex_url": url,
+            "added_at": added_at(it),
+            "rated_at": now if r is not None else 0,
+        }
+
+    # New and re-checked rows replace previous ones by key, keeping MAX_ITEMS in total
+    rows = list(updated.values()) + [row for row in previous if row["plex_url"] not in updated]
+    rows.sort(key=lambda row: row["added_at"], reverse=True)
+    return rows[:MAX_ITEMS], len(updated)
+
+def main(full=False):
+    outdir = Path("public")
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    # Incremental mode: only items added since the newest one already in the outputs,
+    # and rows whose missing ratings are due for another OMDb lookup
+    previous = [] if full else load_rows(outdir)
+    watermark = max((row["added_at"] for row in previous), default=0)
+    now = time.time()
+    if watermark and not any(ratings_due(row, now) for row in previous):
+        newest = newest_added()
+        # Same second as the watermark: only unchanged if it is the row we already have
+        if newest is not None and (newest[0] < watermark or (
+                newest[0] == watermark and any(row["plex_url"].endswith(f"key={newest[1]}") for row in previous))):
+            print("No new items since last run, outputs unchanged")
+            return
+
+    rows, new_count = update_rows(plex_connect(), previous, watermark)
+    if not new_count and previous:
+        print("No new or re-checked items since last run, outputs unchanged")
+        return
+
+    write_outputs(outdir, render_outputs(rows))
+    print(f"Done ({new_count} new item(s)). See public/rss.xml and public/index.html")
+
+class RatingsService:
+    """Keeps the Plex connection, rows and rendered outputs in memory between rebuilds"""
+
+    def __init__(self, outdir=Path("public")):
+        self.outdir = outdir
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        self.plex = None
+        self.rows = load_rows(outdir)
+        self.outputs = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.publish(self.rows)
+
+    def publish(self, rows):
+        outputs = {name: (ctype, body, '"%s"' % hashlib.sha1(body).hexdigest())
+                   for name, (ctype, body) in render_outputs(rows).items()}
+        with self.lock:
+            self.rows, self.outputs = rows, outputs
+        write_outputs(self.outdir, {name: (ctype, body) for name, (ctype, body, _) in outputs.items()})
+
+    def get(self, name):
+        with self.lock:
+            return self.outputs.get(name)
+
+    def request_rebuild(self):
+        self.wakeup.set()
+
+    def rebuild(self):
+        watermark = max((row["added_at"] for row in self.rows), default=0)
+        try:
+            if self.plex is None:
+                self.plex = plex_connect()
+            rows, new_count = update_rows(self.plex, self.rows, watermark)
+        except Exception as e:
+            print("Rebuild failed, reconnecting to Plex next time:", e)
+            self.plex = None
+            return
+        if new_count:
+            self.publish(rows)
+        print(f"Rebuilt ratings feed ({new_count} new item(s))")
+
+    def run(self):
+        """Rebuild once at start, then whenever a webhook asks; bursts share one rebuild"""
+        self.wakeup.set()
+        while True:
+            self.wakeup.wait()
+            time.sleep(REBUILD_DELAY)
+            self.wakeup.clear()
+            self.rebuild()
+
+class RatingsHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        name = urlparse(self.path).path.strip("/") or "index.html"
+        output = self.service.get(name)
+        if not output:
+            self.send_error(404)
+            return
+        ctype, body, etag = output
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if path == "/webhook":
+            event = parse_webhook(self.headers.get("Content-Type", ""), body).get("event")
+            if event == "library.new":
+                self.service.request_rebuild()
+        elif path == "/rebuild":
+            self.service.request_rebuild()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(202)
+        self.end_headers()
 
-    print("Done. See public/rss.xml and public/index.html")
+def serve(host, port):
+    service = RatingsService()
+    threading.Thread(target=service.run, name="ratings-rebuild", daemon=True).start()
+    RatingsHandler.service = service
+    httpd = ThreadingHTTPServer((host, port), RatingsHandler)
+    print(f"Serving ratings feed on http://{host}:{port}/ (Plex webhook: /webhook)")
+    httpd.serve_forever()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate the BeyTV ratings feed")
+    parser.add_argument("--full", action="store_true", help="rebuild everything instead of adding new items")
+    parser.add_argument("--serve", action="store_true", help="stay running, serve the feed and rebuild on Plex webhooks")
+    parser.add_argument("--port", type=int, default=RATINGS_PORT)
+    args = parser.parse_args()
+    if args.serve:
+        serve(RATINGS_HOST, args.port)
+    else:
+        main(full=args.full)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+BeyTV Auto-Download Rules - match incoming feed items against user rules
+Rules are compiled once and indexed by feed and title keyword, so each
+item is only checked against the handful of rules that could match it
+"""
+
+import re
+import json
+import time
+import sqlite3
+from collections import defaultdict
+
+from feeds import parse_size
+from item_store import DEFAULT_DB
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+RESOLUTION_RE = re.compile(r'\b(2160p|4k|uhd|1080p|720p|480p)\b', re.IGNORECASE)
+EPISODE_RE = re.compile(r'\bs(\d{1,2})\s?e(\d{1,3})\b|\b(\d{1,2})x(\d{2,3})\b', re.IGNORECASE)
+
+RESOLUTION_ALIASES = {'4k': '2160p', 'uhd': '2160p'}
+
+
+def parse_resolution(title):
+    """'Movie.2024.2160p.WEB' -> '2160p' ('' when not stated)"""
+    match = RESOLUTION_RE.search(title or '')
+    if not match:
+        return ''
+    value = match.group(1).lower()
+    return RESOLUTION_ALIASES.get(value, value)
+
+
+def parse_episode(title):
+    """Return (season, episode) from S01E02 / 1x02 style titles, or None"""
+    match = EPISODE_RE.search(title or '')
+    if not match:
+        return None
+    season = match.group(1) or match.group(3)
+    episode = match.group(2) or match.group(4)
+    return int(season), int(episode)
+
+
+class Rule:
+    """A compiled match rule"""
+
+    __slots__ = ('id', 'name', 'words', 'regex', 'resolution', 'min_size',
+                 'max_size', 'feed', 'track_episodes', 'save_path')
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.name = data.get('name') or data.get('pattern', '')
+        pattern = (data.get('pattern') or '').strip()
+        # "re:<regex>" for regular expressions, otherwise all words must appear
+        if pattern.startswith('re:'):
+            self.regex = re.compile(pattern[3:], re.IGNORECASE)
+            self.words = ()
+        else:
+            self.regex = None
+            self.words = tuple(WORD_RE.findall(pattern.lower()))
+        resolution = (data.get('resolution') or '').lower()
+        self.resolution = RESOLUTION_ALIASES.get(resolution, resolution)
+        self.min_size = size_bytes(data.get('min_size'))
+        self.max_size = size_bytes(data.get('max_size'))
+        self.feed = data.get('feed') or ''
+        self.track_episodes = bool(data.get('track_episodes'))
+        self.save_path = data.get('save_path') or ''
+
+    @property
+    def anchor(self):
+        """Longest keyword, used as the index key (longer words are rarer)"""
+        return max(self.words, key=len) if self.words else None
+
+    def matches(self, item, tokens, resolution):
+        if self.resolution and resolution != self.resolution:
+            return False
+        if self.min_size and not (item.size and item.size >= self.min_size):
+            return False
+        if self.max_size and not (item.size and item.size <= self.max_size):
+            return False
+        if self.words and not all(word in tokens for word in self.words):
+            return False
+        if self.regex and not self.regex.search(item.title):
+            return False
+        return True
+
+
+def size_bytes(value):
+    """Accept sizes as bytes or strings such as '20 GB'"""
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(value) if str(value).isdigit() else parse_size(str(value))
+
+
+class RuleEngine:
+    """Evaluates many rules against many items in a single pass"""
+
+    def __init__(self, rules):
+        self.rules = [Rule(r) for r in rules]
+        # feed -> anchor keyword -> rules; rules without keywords are checked for every item
+        self.by_anchor = defaultdict(lambda: defaultdict(list))
+        self.unanchored = defaultdict(list)
+        for rule in self.rules:
+            if rule.anchor:
+                self.by_anchor[rule.feed][rule.anchor].append(rule)
+            else:
+                self.unanchored[rule.feed].append(rule)
+
+    def candidates(self, item, tokens):
+        for feed in ('', item.source):
+            anchored = self.by_anchor.get(feed)
+            if anchored:
+                for token in tokens:
+                    yield from anchored.get(token, ())
+            yield from self.unanchored.get(feed, ())
+
+    def match(self, items, grabbed=None):
+        """Return [(rule, item)] for items matched by a rule.
+
+        grabbed is a set of (rule_id, season, episode) already downloaded;
+        it is updated in place so one episode is only queued once.
+        """
+        grabbed = set() if grabbed is None else grabbed
+        matches = []
+        for item in items:
+            tokens = set(WORD_RE.findall(item.title.lower()))
+            resolution = parse_resolution(item.title)
+            for rule in self.candidates(item, tokens):
+                if not rule.matches(item, tokens, resolution):
+                    continue
+                if rule.track_episodes:
+                    episode = parse_episode(item.title)
+                    if episode:
+                        key = (rule.id,) + episode
+                        if key in grabbed:
+                            continue
+                        grabbed.add(key)
+                matches.append((rule, item))
+                break  # first matching rule wins
+        return matches
+
+
+class RuleStore:
+    """Persists rules and tracked episodes next to the item store"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.init_database()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        conn = self.connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data TEXT NOT NULL,
+                enabled INTEGER DEFAULT 1,
+                updated_at INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rule_episodes (
+                rule_id INTEGER NOT NULL,
+                season INTEGER NOT NULL,
+                episode INTEGER NOT NULL,
+                grabbed_at INTEGER NOT NULL,
+                PRIMARY KEY (rule_id, season, episode)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def list_rules(self, enabled_only=False):
+        conn = self.connect()
+        try:
+            sql = 'SELECT id, data, enabled FROM rules'
+            if enabled_only:
+                sql += ' WHERE enabled = 1'
+            rules = []
+            for row in conn.execute(sql + ' ORDER BY id'):
+                data = json.loads(row['data'])
+                data.update(id=row['id'], enabled=bool(row['enabled']))
+                rules.append(data)
+            return rules
+        finally:
+            conn.close()
+
+    def add_rule(self, data):
+        """Validate and store a rule, returning its id"""
+        data = {k: v for k, v in data.items() if k not in ('id', 'enabled')}
+        Rule(dict(data, id=0))  # raises on invalid regex
+        conn = self.connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'INSERT INTO rules (data, enabled, updated_at) VALUES (?, 1, ?)',
+                    (json.dumps(data), int(time.time())))
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def delete_rule(self, rule_id):
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM rules WHERE id = ?', (rule_id,))
+                conn.execute('DELETE FROM rule_episodes WHERE rule_id = ?', (rule_id,))
+        finally:
+            conn.close()
+
+    def signature(self):
+        """Changes whenever the rule set changes, used to reuse a compiled engine"""
+        conn = self.connect()
+        try:
+            return tuple(conn.execute('SELECT COUNT(*), MAX(id), MAX(updated_at) FROM rules').fetchone())
+        finally:
+            conn.close()
+
+    def grabbed_episodes(self):
+        conn = self.connect()
+        try:
+            return {tuple(row) for row in conn.execute('SELECT rule_id, season, episode FROM rule_episodes')}
+        finally:
+            conn.close()
+
+    def record_matches(self, matches):
+        """Remember tracked episodes so they are not queued again"""
+        now = int(time.time())
+        conn = self.connect()
+        try:
+            with conn:
+                for rule, item in matches:
+                    episode = parse_episode(item.title) if rule.track_episodes else None
+                    if episode:
+                        conn.execute('INSERT OR IGNORE INTO rule_episodes VALUES (?, ?, ?, ?)',
+                                     (rule.id, episode[0], episode[1], now))
+        finally:
+            conn.close()
+
+
+_engine_cache = {}
+
+
+def load_engine(store):
+    """Compiled engine for the current rule set, rebuilt only when rules change"""
+    signature = store.signature()
+    cached = _engine_cache.get(store.path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    engine = RuleEngine(store.list_rules(enabled_only=True))
+    _engine_cache[store.path] = (signature, engine)
+    return engine
+
+
+def match_items(items, store=None):
+    """Run all rules over items; episodes already grabbed are skipped.
+
+    Nothing is recorded here: call RuleStore.record_matches with the matches
+    that were actually queued or pushed, so a failed push is retried.
+    """
+    store = store or RuleStore()
+    engine = load_engine(store)
+    if not engine.rules or not items:
+        return []
+    return engine.match(items, store.grabbed_episodes())
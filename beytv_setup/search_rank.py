@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+BeyTV Search Ranking - merge, dedupe and rank search results
+Local index hits and qBittorrent plugin results are folded together by
+infohash (or normalized name plus size when there is none), then scored
+as a batch on swarm health, size fit, resolution and source reliability.
+Scoring is vectorized with NumPy when it is installed and falls back to
+the same formula row by row otherwise
+"""
+
+import os
+import re
+import math
+from types import SimpleNamespace
+
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from feeds import parse_infohash
+from rules import parse_resolution
+
+SEARCH_RESOLUTION = os.environ.get('SEARCH_RESOLUTION', '1080p')  # preferred resolution
+
+RESOLUTION_RANK = {'480p': 0, '720p': 1, '1080p': 2, '2160p': 3}
+# Typical size of a movie release per resolution; the further off, the lower the size fit
+TYPICAL_SIZE = {'480p': 0.7e9, '720p': 1.5e9, '1080p': 4e9, '2160p': 15e9, '': 3e9}
+WEIGHTS = {'swarm': 0.5, 'resolution': 0.2, 'size': 0.15, 'reliability': 0.15}
+UNKNOWN_RELIABILITY = 0.8
+LOCAL_RELIABILITY = 0.9  # items from the curated RSS feeds
+NAME_RE = re.compile(r'[^a-z0-9]+')
+
+_scalar = SimpleNamespace(log1p=math.log1p, log=math.log, exp=math.exp, abs=abs,
+                          maximum=max, where=lambda c, a, b: a if c else b)
+
+
+def _int(value):
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def candidate(result):
+    """Common view of a local item (title/seeders/...) or plugin result (fileName/nbSeeders/...)"""
+    if 'fileName' in result:
+        title = result.get('fileName') or ''
+        infohash = parse_infohash(result.get('fileUrl')) or parse_infohash(result.get('descrLink'))
+        return (title, infohash, _int(result.get('fileSize')), _int(result.get('nbSeeders')),
+                _int(result.get('nbLeechers')), result.get('plugin') or result.get('siteUrl') or '', False)
+    return (result.get('title') or '', result.get('infohash') or parse_infohash(result.get('magnet')),
+            _int(result.get('size')), _int(result.get('seeders')), 0, result.get('source') or '', True)
+
+
+def dedupe_key(title, infohash, size):
+    if infohash:
+        return infohash.lower()
+    # ~5% size buckets: sites round sizes differently
+    return NAME_RE.sub(' ', title.lower()).strip(), round(math.log(size) * 20) if size else 0
+
+
+def score(xp, seeders, leechers, size, typical, res_rank, reliability, max_swarm, preferred):
+    """One formula for NumPy arrays (xp=numpy) and plain numbers (xp=_scalar)"""
+    swarm = (xp.log1p(seeders) + 0.3 * xp.log1p(leechers)) / max_swarm
+    resolution = xp.where(res_rank < 0, 0.4, xp.maximum(0.0, 1.0 - 0.3 * xp.abs(res_rank - preferred)))
+    fit = xp.where(size > 0, xp.exp(-xp.abs(xp.log(xp.maximum(size, 1) / typical))), 0.3)
+    return (WEIGHTS['swarm'] * swarm + WEIGHTS['resolution'] * resolution
+            + WEIGHTS['size'] * fit + WEIGHTS['reliability'] * reliability)
+
+
+def rank_results(results, reliability=None, preferred=SEARCH_RESOLUTION, limit=None):
+    """Deduped results, best first, each with 'score' and 'sources' added.
+
+    reliability maps plugin names to a 0..1 success rate (see plugin_search).
+    """
+    reliability = reliability or {}
+    groups = {}
+    for result in results:
+        title, infohash, size, seeders, leechers, source, local = candidate(result)
+        key = dedupe_key(title, infohash, size)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = group = {'result': result, 'size': size, 'seeders': seeders,
+                                   'leechers': leechers, 'sources': [], 'reliability': 0.0, 'title': title}
+        elif seeders > group['seeders']:
+            group['result'] = result  # the best-seeded copy represents the release
+        group['seeders'] = max(group['seeders'], seeders)
+        group['leechers'] = max(group['leechers'], leechers)
+        group['size'] = group['size'] or size
+        if source not in group['sources']:
+            group['sources'].append(source)
+        rel = LOCAL_RELIABILITY if local else reliability.get(source, UNKNOWN_RELIABILITY)
+        group['reliability'] = max(group['reliability'], rel)
+    if not groups:
+        return []
+
+    rows = list(groups.values())
+    # Listed by several sources: more trustworthy than any single one
+    rel = [min(1.0, g['reliability'] + 0.1 * (len(g['sources']) - 1)) for g in rows]
+    resolutions = [parse_resolution(g['title']) for g in rows]
+    res = [RESOLUTION_RANK.get(r, -1) for r in resolutions]
+    typical = [TYPICAL_SIZE.get(r, TYPICAL_SIZE['']) for r in resolutions]
+    preferred = RESOLUTION_RANK.get(preferred, 2)
+
+    if HAS_NUMPY:
+        seeders = numpy.array([g['seeders'] for g in rows], dtype=float)
+        leechers = numpy.array([g['leechers'] for g in rows], dtype=float)
+        swarm = numpy.log1p(seeders) + 0.3 * numpy.log1p(leechers)
+        scores = score(numpy, seeders, leechers, numpy.array([g['size'] for g in rows], dtype=float),
+                       numpy.array(typical), numpy.array(res, dtype=float), numpy.array(rel),
+                       max(float(swarm.max()), 1.0), preferred)
+        order = numpy.argsort(-scores, kind='stable').tolist()
+        scores = scores.tolist()
+    else:
+        max_swarm = max(max(math.log1p(g['seeders']) + 0.3 * math.log1p(g['leechers']) for g in rows), 1.0)
+        scores = [score(_scalar, g['seeders'], g['leechers'], g['size'], t, r, rl, max_swarm, preferred)
+                  for g, t, r, rl in zip(rows, typical, res, rel)]
+        order = sorted(range(len(rows)), key=lambda i: -scores[i])
+
+    ranked = []
+    for i in order[:limit]:
+        result = dict(rows[i]['result'], score=round(scores[i], 3), sources=rows[i]['sources'])
+        ranked.append(result)
+    return ranked
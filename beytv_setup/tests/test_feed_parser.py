@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from feed_parser import parse_feed, fast_parse, feedparser_parse
+
+HASH = "0123456789abcdef0123456789abcdef01234567"
+
+
+def rss(item):
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{item}</channel></rss>'.encode()
+
+
+def test_magnet_inside_description_anchor():
+    body = rss(
+        "<item><title>Show S01E01 1080p</title><link>https://site/details/1</link>"
+        "<description>&lt;p&gt;Size: 1.2 GB&lt;/p&gt;&lt;a href=\"magnet:?xt=urn:btih:"
+        f"{HASH.upper()}&amp;amp;dn=Show\"&gt;Download&lt;/a&gt;</description></item>")
+    [item] = parse_feed(body, "src")
+    assert item.magnet == f"magnet:?xt=urn:btih:{HASH.upper()}&dn=Show"
+    assert item.infohash == HASH
+    assert item.description == "Size: 1.2 GB Download"
+    assert "magnet:" not in item.description
+
+
+def test_torznab_attributes():
+    body = (b'<?xml version="1.0"?><rss version="2.0" xmlns:torznab="http://torznab.com/schemas/2015/feed">'
+            b'<channel><item><title>Movie 2160p</title><link>https://site/dl/2</link>'
+            b'<torznab:attr name="size" value="5000"/><torznab:attr name="seeders" value="42"/>'
+            b'<torznab:attr name="infohash" value="' + HASH.upper().encode() + b'"/></item></channel></rss>')
+    [item] = parse_feed(body, "src")
+    assert (item.size, item.seeders, item.infohash) == (5000, 42, HASH)
+
+
+def test_atom_falls_back_to_feedparser():
+    body = (b'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><entry><title>Atom 720p</title>'
+            b'<link href="magnet:?xt=urn:btih:' + HASH.encode() + b'"/></entry></feed>')
+    [item] = parse_feed(body, "src")
+    assert item.infohash == HASH
+
+
+FEEDS = Path(__file__).resolve().parent / "feeds"
+
+
+@pytest.mark.parametrize("name", ["ezrss.xml", "yts.xml", "torznab.xml"])
+def test_fast_parse_matches_feedparser_on_recorded_feeds(name):
+    body = (FEEDS / name).read_bytes()
+    fast = fast_parse(body, name)
+    slow = feedparser_parse(body, name)
+    assert fast and len(fast) == len(slow)
+    if name != "torznab.xml":
+        assert fast == slow
+        return
+    # feedparser keeps only the last <torznab:attr> of an item, so the
+    # attr-only fields (magneturl, infohash, seeders) are the streaming
+    # parser's to win; everything else must agree
+    for a, b in zip(fast, slow):
+        assert a._replace(magnet="", infohash="", seeders=0) == b._replace(magnet="", infohash="", seeders=0)
+    assert all(item.infohash and item.seeders for item in fast)
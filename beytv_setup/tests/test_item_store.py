@@ -0,0 +1,22 @@
+import time
+
+from feeds import FeedItem
+from item_store import ItemStore
+
+
+def item(title, source, published):
+    infohash = f"{published:040x}"
+    return FeedItem(title, "", f"magnet:?xt=urn:btih:{infohash}", infohash, 0, published, 0, source, "")
+
+
+def test_items_from_several_feeds_are_listed_newest_first(tmp_path):
+    store = ItemStore(str(tmp_path / "items.db"))
+    now = int(time.time())
+    # Each feed is stored in one batch, so insertion order is not date order
+    store.upsert([item("A new", "a", now - 10), item("A old", "a", now - 300)])
+    store.upsert([item("B newest", "b", now), item("B middle", "b", now - 100)])
+
+    titles = [row["title"] for row in store.list_items()]
+    assert titles == ["B newest", "A new", "B middle", "A old"]
+    assert [row["title"] for row in store.list_items(limit=2, offset=1)] == ["A new", "B middle"]
+    assert [row["title"] for row in store.list_items(source="a")] == ["A new", "A old"]
@@ -0,0 +1,48 @@
+import time
+import threading
+
+from migrate import MigrationQueue, Migrator
+
+
+def test_moves_start_as_soon_as_a_worker_frees_up(tmp_path):
+    queue = MigrationQueue(str(tmp_path / "moves.db"))
+    for name in ("slow", "fast1", "fast2"):
+        queue.add("torrent", name, "/dst")
+    started = {}
+    release = threading.Event()
+
+    class Recorder(Migrator):
+        def move_torrent(self, move):
+            started[move["src"]] = time.monotonic()
+            if move["src"] == "slow":
+                release.wait(5)
+            return move["dst"]
+
+    migrator = Recorder(queue, qb_call=None, max_moves=2)
+    runner = threading.Thread(target=migrator.run, kwargs={"once": True, "poll_interval": 0.05})
+    runner.start()
+    # fast2 must not wait for the slow move of the first batch
+    deadline = time.monotonic() + 5
+    while "fast2" not in started and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "fast2" in started
+    release.set()
+    runner.join(5)
+    assert not runner.is_alive()
+    assert queue.list(("pending", "running")) == []
+
+
+def test_copy_verifies_through_the_throttle(tmp_path):
+    src = tmp_path / "src" / "movie.mkv"
+    src.parent.mkdir()
+    src.write_bytes(b"x" * 1000)
+    queue = MigrationQueue(str(tmp_path / "moves.db"))
+    move_id = queue.add("file", str(src), str(tmp_path / "dst"))
+    migrator = Migrator(queue, qb_call=None)
+    consumed = []
+    migrator.throttle.consume = consumed.append
+
+    migrator.move_path({"id": move_id, "src": str(src), "dst": str(tmp_path / "dst")})
+    assert (tmp_path / "dst" / "movie.mkv").read_bytes() == b"x" * 1000
+    # copy + digest of the part file + digest of the source
+    assert sum(consumed) == 3000
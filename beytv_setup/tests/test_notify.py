@@ -0,0 +1,122 @@
+import json
+import time
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import notify
+from qbt_scheduler import TokenBucket
+from seen_store import SeenStore
+
+
+def test_created_items_are_bounded():
+    notifier = notify.EventNotifier(seen=None)
+    for item_id in range(notify.CREATED_MAX + 10):
+        notifier.track_created(item_id, now=1000)
+    assert len(notifier.created) == notify.CREATED_MAX
+    assert 0 not in notifier.created
+
+    # Items never processed expire after CREATED_TTL
+    notifier.track_created(-1, now=1000 + notify.CREATED_TTL + 1)
+    assert list(notifier.created) == [-1]
+
+
+def long_messages(count):
+    """Each too long to share a digest with another"""
+    return [(str(n), f"message {n} " + "x" * (notify.MESSAGE_LIMIT // 2)) for n in range(count)]
+
+
+class Seen:
+    def __init__(self):
+        self.guids = []
+
+    def add(self, *guids):
+        self.guids.extend(guids)
+
+
+def test_deliver_sends_digests_in_order(monkeypatch):
+    sent = []
+
+    def slow_first(text):
+        # Earlier digests take longer: concurrent sends would arrive reversed
+        time.sleep(0.02 * (3 - int(text.split()[1])))
+        sent.append(text)
+        return True
+
+    monkeypatch.setattr(notify, "tg_send", slow_first)
+    assert notify.deliver(long_messages(3), Seen()) == []
+    assert [text.split()[1] for text in sent] == ["0", "1", "2"]
+
+
+def test_deliver_holds_back_digests_after_a_failure(monkeypatch):
+    results = iter([True, False, True])
+    sent = []
+    monkeypatch.setattr(notify, "tg_send", lambda text: sent.append(text) or next(results))
+    msgs = long_messages(3)
+    seen = Seen()
+
+    failed = notify.deliver(msgs, seen)
+    assert len(sent) == 2
+    assert seen.guids == ["0"]
+    assert failed == msgs[1:]
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    """Bot API stand-in behind TELEGRAM_API: rate limits the first message, rejects
+    any containing 'reject', records the texts it accepted in order"""
+    state = {"calls": 0, "accepted": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            assert self.path == "/botbot/sendMessage" and body["chat_id"] == notify.CHAT_ID
+            state["calls"] += 1
+            if state["calls"] == 1:
+                status, reply = 429, {"ok": False, "parameters": {"retry_after": 1}}
+            elif "reject" in body["text"]:
+                status, reply = 400, {"ok": False, "description": "Bad Request"}
+            else:
+                status, reply = 200, {"ok": True}
+                state["accepted"].append(body["text"])
+            data = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(notify, "TELEGRAM_API", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(notify, "BOT_TOKEN", "bot")
+    monkeypatch.setattr(notify, "tg_bucket", TokenBucket(1000, 1000))
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_deliver_waits_out_a_429_and_keeps_order(telegram, tmp_path):
+    seen = SeenStore(tmp_path / "seen.db")
+    msgs = long_messages(3)
+    start = time.monotonic()
+
+    assert notify.deliver(msgs, seen) == []
+    assert time.monotonic() - start >= 1  # honoured retry_after before resending
+    assert telegram["calls"] == 4
+    assert [text.split()[1] for text in telegram["accepted"]] == ["0", "1", "2"]
+    assert seen.unseen(["0", "1", "2"]) == set()
+
+
+def test_failed_digest_leaves_its_items_unseen(telegram, tmp_path):
+    seen = SeenStore(tmp_path / "seen.db")
+    msgs = long_messages(3)
+    msgs[1] = ("1", "reject " + msgs[1][1])
+
+    failed = notify.deliver(msgs, seen)
+    assert [text.split()[1] for text in telegram["accepted"]] == ["0"]
+    assert failed == msgs[1:]
+    assert seen.unseen(["0", "1", "2"]) == {"1", "2"}
@@ -0,0 +1,34 @@
+import pytest
+
+from placement import PlacementPolicy, content_type, parse_size, placement_path
+
+MAGNET = "magnet:?xt=urn:btih:" + "a" * 40 + "&dn=Show.S02E05.1080p&xl=2000000000"
+
+
+def test_parse_size_uses_the_feed_parser_and_rejects_garbage():
+    assert parse_size("20GB") == 20 * 1024 ** 3
+    assert parse_size("700 MiB") == 700 * 1024 ** 2
+    assert parse_size("1234") == 1234
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_content_type():
+    assert content_type("Show S02E05 1080p") == "tv"
+    assert content_type("Show 2x05") == "tv"
+    assert content_type("Show Season 2 Complete") == "tv"
+    assert content_type("Movie 2024 2160p") == "movie"
+
+
+def test_placement_path_picks_a_tier(tmp_path, monkeypatch):
+    tiers = {"ssd": str(tmp_path / "ssd"), "hdd": str(tmp_path / "hdd")}
+    (tmp_path / "ssd").mkdir()
+    (tmp_path / "hdd").mkdir()
+    monkeypatch.setenv("PLACEMENT_MIN_FREE", "1")
+    assert placement_path(MAGNET, tiers=tiers) == tiers["ssd"]          # tv=ssd, title from dn=
+    assert placement_path(MAGNET, save_path="/rule/path", tiers=tiers) == "/rule/path"
+    assert PlacementPolicy(tiers, min_free="1").choose("Movie 2024", 30 * 1024 ** 3)[0] == "hdd"
+
+
+def test_placement_path_without_tiers_keeps_the_default(tmp_path):
+    assert placement_path(MAGNET, tiers={"ssd": str(tmp_path / "missing")}) is None
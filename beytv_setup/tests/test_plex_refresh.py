@@ -0,0 +1,85 @@
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from plex_refresh import PlexRefresher
+
+SECTIONS = b"""<MediaContainer>
+<Directory key="1" title="Movies"><Location path="/media/movies"/></Directory>
+<Directory key="2" title="TV Shows"><Location path="/media/tv"/></Directory>
+</MediaContainer>"""
+
+
+@pytest.fixture
+def plex():
+    """Stub Plex answering /library/sections and recording partial scans"""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            requests_seen.append((url.path, query.get("path", [None])[0], query.get("X-Plex-Token", [None])[0]))
+            self.send_response(200)
+            self.end_headers()
+            if url.path == "/library/sections":
+                self.wfile.write(SECTIONS)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def scans(requests_seen):
+    return sorted((path, scan) for path, scan, _ in requests_seen if path.endswith("/refresh"))
+
+
+def test_completions_in_one_window_become_one_scan_per_folder(plex):
+    url, requests_seen = plex
+    refresher = PlexRefresher(url, "token", window=60,
+                              path_map={"/mnt/ssd_media": "/media", "/mnt/hdd_media": "/media"})
+    refresher.queue("/mnt/ssd_media/tv/Show/Season 1/Show.S01E01.mkv")
+    refresher.queue("/mnt/ssd_media/tv/Show/Season 1/Show.S01E02.mkv")
+    refresher.queue("/mnt/hdd_media/tv/Show")  # parent of the season folder above
+    refresher.queue("/mnt/hdd_media/movies/Movie (2024)/Movie.mkv")
+    assert requests_seen == []  # nothing scanned before the window closes
+
+    refresher.close()
+    assert scans(requests_seen) == [
+        ("/library/sections/1/refresh", "/media/movies/Movie (2024)"),
+        ("/library/sections/2/refresh", "/media/tv/Show"),
+    ]
+    assert all(token == "token" for _, _, token in requests_seen)
+    assert sum(path == "/library/sections" for path, _, _ in requests_seen) == 1
+
+
+def test_tier_root_scans_every_section_below_it(plex):
+    url, requests_seen = plex
+    refresher = PlexRefresher(url, "token", path_map={"/mnt/ssd_media": "/media"})
+    assert refresher.plex_path("/mnt/ssd_media/movies/Movie") == "/media/movies/Movie"
+    assert refresher.plex_path("/elsewhere/Movie") == "/elsewhere/Movie"
+
+    refresher.refresh({refresher.plex_path("/mnt/ssd_media")})
+    assert scans(requests_seen) == [("/library/sections/1/refresh", "/media/movies"),
+                                    ("/library/sections/2/refresh", "/media/tv")]
+
+
+def test_router_refreshes_the_folder_of_a_moved_file(plex, tmp_path, monkeypatch):
+    import router
+    url, requests_seen = plex
+    movie = tmp_path / "movies" / "Movie (2024)"
+    movie.mkdir(parents=True)
+    (movie / "Movie.mkv").write_bytes(b"")
+    monkeypatch.setattr(router, "PLEX_TOKEN", "token")
+    monkeypatch.setattr(router, "_refresher", PlexRefresher(url, "token", path_map={str(tmp_path): "/media"}))
+
+    router.plex_refresh(str(movie / "Movie.mkv"), str(tmp_path / "tv" / "Show"))
+    assert scans(requests_seen) == [("/library/sections/1/refresh", "/media/movies/Movie (2024)"),
+                                    ("/library/sections/2/refresh", "/media/tv/Show")]
@@ -0,0 +1,62 @@
+import main
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+class ExpiringSession:
+    """qBittorrent that forgets the session once: the first non-login call gets a 403"""
+
+    def __init__(self):
+        self.calls = []
+        self.expired = False
+
+    def request(self, method, url, **kwargs):
+        path = url.split("8080", 1)[1]
+        self.calls.append(path)
+        if path == "/api/v2/auth/login":
+            return FakeResponse(200, "Ok.")
+        if not self.expired:
+            self.expired = True
+            return FakeResponse(403, "Forbidden")
+        return FakeResponse(200)
+
+
+def test_request_logs_in_again_after_403(monkeypatch):
+    monkeypatch.setattr(main.requests, "Session", ExpiringSession)
+    api = main.QBittorrentAPI()
+    assert api.logged_in
+
+    response = api.request("GET", "/api/v2/torrents/info")
+    assert response.status_code == 200
+    assert api.logged_in
+    assert api.session.calls == ["/api/v2/auth/login", "/api/v2/torrents/info",
+                                 "/api/v2/auth/login", "/api/v2/torrents/info"]
+
+
+def test_request_retries_only_once(monkeypatch):
+    class Forbidden(ExpiringSession):
+        def request(self, method, url, **kwargs):
+            path = url.split("8080", 1)[1]
+            self.calls.append(path)
+            return FakeResponse(200, "Ok.") if path == "/api/v2/auth/login" else FakeResponse(403)
+
+    monkeypatch.setattr(main.requests, "Session", Forbidden)
+    api = main.QBittorrentAPI()
+    assert api.request("GET", "/api/v2/torrents/info").status_code == 403
+    assert api.session.calls.count("/api/v2/torrents/info") == 2
+
+
+def test_pool_add_keeps_sync_rid():
+    backend = main.QBittorrentAPI.__new__(main.QBittorrentAPI)
+    backend._load = {"sampled_at": 123.0, "rid": 42, "active": 1, "throughput": 0, "free_space": 10}
+    backend.add_torrent = lambda url, save_path, priority: True
+    pool = main.QBittorrentPool.__new__(main.QBittorrentPool)
+    pool.choose_backend = lambda size: backend
+
+    assert pool.add_torrent("magnet:?xt=urn:btih:" + "a" * 40) is backend
+    assert backend._load["sampled_at"] == 0
+    assert backend._load["rid"] == 42
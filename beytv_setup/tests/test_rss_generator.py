@@ -0,0 +1,99 @@
+import json
+import threading
+from types import SimpleNamespace
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import rss_generator as gen
+
+PLEX = SimpleNamespace(machineIdentifier="machine")
+DAY = 86400
+
+
+def media(key, added, title=None):
+    return SimpleNamespace(title=title or key, year=None, key=f"/library/metadata/{key}", addedAt=added)
+
+
+def row(it, rated_at, imdb=""):
+    return {"title": it.title, "imdb": imdb, "rt": "", "metacritic": "",
+            "plex_url": gen.plex_url(PLEX, it), "added_at": it.addedAt, "rated_at": rated_at}
+
+
+def run_update(monkeypatch, library, previous, watermark, answers):
+    asked = []
+
+    def enrich(items):
+        asked.extend(it.title for it in items)
+        return [answers.get(it.title) for it in items]
+
+    monkeypatch.setattr(gen, "get_recent", lambda plex: library)
+    monkeypatch.setattr(gen, "added_at", lambda it: it.addedAt)
+    monkeypatch.setattr(gen, "enrich", enrich)
+    rows, count = gen.update_rows(PLEX, previous, watermark)
+    return rows, count, asked
+
+
+def test_unrated_rows_are_retried_only_after_the_negative_ttl(monkeypatch):
+    now = gen.time.time()
+    known, unknown, fresh = media("known", 100), media("unknown", 90), media("fresh", 100)
+    empty = gen.ratings_from_omdb(None)
+    previous = [row(known, now, imdb="7/10"), row(unknown, now - 60)]
+
+    # OMDb said "no ratings" a minute ago: only the new item (same second as the watermark) is looked up
+    rows, count, asked = run_update(monkeypatch, [known, fresh, unknown], previous, 100,
+                                    {"fresh": dict(empty, imdb="6/10")})
+    assert asked == ["fresh"] and count == 1
+    assert not any(gen.ratings_due(r, now) for r in rows)
+
+    # Once the negative answer expired the row is asked again, and stamped even if still unknown
+    expired = [row(known, now, imdb="7/10"), row(unknown, now - gen.OMDB_NEGATIVE_TTL_HOURS * 3600 - 1)]
+    assert gen.ratings_due(expired[1], now)
+    rows, count, asked = run_update(monkeypatch, [known, unknown], expired, 100, {"unknown": empty})
+    assert asked == ["unknown"] and count == 1
+    assert [r["rated_at"] > 0 for r in rows if r["title"] == "unknown"] == [True]
+
+
+def test_lookup_without_an_answer_stays_due(monkeypatch):
+    item = media("slow", 100)
+    rows, count, asked = run_update(monkeypatch, [item], [], 0, {})  # deadline hit: enrich gave None
+    assert count == 1 and rows[0]["rated_at"] == 0
+    assert gen.ratings_due(rows[0])
+
+
+def test_newest_added_only_looks_at_generated_library_types(monkeypatch):
+    calls = []
+
+    class Plex(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            calls.append(url.path)
+            if url.path == "/library/sections":
+                body = {"Directory": [{"key": "1", "type": "movie"}, {"key": "2", "type": "show"},
+                                      {"key": "3", "type": "artist"}]}
+            else:
+                section = url.path.split("/")[3]
+                assert parse_qs(url.query)["sort"] == ["addedAt:desc"]
+                added = {"1": 100, "2": 200, "3": 900}[section]
+                body = {"Metadata": [{"addedAt": added, "key": f"/library/metadata/{section}"}]}
+            data = json.dumps({"MediaContainer": body}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Plex)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setattr(gen, "PLEX_URL", f"http://127.0.0.1:{server.server_port}")
+        monkeypatch.setattr(gen, "LIBRARY_TYPE", "both")
+        # The music section's newer item must not move the watermark check
+        assert gen.newest_added() == (200, "/library/metadata/2")
+        monkeypatch.setattr(gen, "LIBRARY_TYPE", "movie")
+        assert gen.newest_added() == (100, "/library/metadata/1")
+        assert "/library/sections/3/all" not in calls
+    finally:
+        server.shutdown()
+        server.server_close()
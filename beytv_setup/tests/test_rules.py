@@ -0,0 +1,75 @@
+import sqlite3
+
+from feeds import FeedItem
+from item_store import ItemStore
+from ingest import FeedIngest
+from rules import RuleStore, match_items
+
+HASH = "a" * 40
+
+
+def feed(title, infohash=HASH):
+    return (f'<?xml version="1.0"?><rss version="2.0"><channel><item><title>{title}</title>'
+            f'<link>magnet:?xt=urn:btih:{infohash}</link></item></channel></rss>').encode()
+
+
+def item(title):
+    return FeedItem(title, "", f"magnet:?xt=urn:btih:{HASH}", HASH, 0, 0, 0, "f", "")
+
+
+def test_match_items_does_not_record_episodes(tmp_path):
+    rules = RuleStore(str(tmp_path / "items.db"))
+    rules.add_rule({"name": "show", "pattern": "Show", "track_episodes": True})
+    assert len(match_items([item("Show S01E02 1080p")], rules)) == 1
+    assert rules.grabbed_episodes() == set()
+    assert len(match_items([item("Show S01E02 1080p")], rules)) == 1
+
+
+def test_episode_recorded_only_after_successful_push(tmp_path):
+    store = ItemStore(str(tmp_path / "items.db"))
+    rules = RuleStore(store.path)
+    rule_id = rules.add_rule({"name": "show", "pattern": "Show", "track_episodes": True})
+    first = feed("Show S01E02 1080p")
+    FeedIngest(lambda url: first, store, push=lambda matches: []).run([("f", "x")])
+    assert rules.grabbed_episodes() == set()
+
+    # Another release of the same episode is still wanted after the failed push
+    second = feed("Show S01E02 720p", "b" * 40)
+    pushed = []
+    FeedIngest(lambda url: second, store, push=lambda matches: pushed.extend(matches) or matches).run([("f", "x")])
+    assert [i.title for _, i in pushed] == ["Show S01E02 720p"]
+    assert rules.grabbed_episodes() == {(rule_id, 1, 2)}
+
+
+def test_failed_push_is_retried_from_the_store(tmp_path):
+    store = ItemStore(str(tmp_path / "items.db"))
+    rules = RuleStore(store.path)
+    rules.add_rule({"name": "show", "pattern": "Show", "track_episodes": True})
+    body = feed("Show S01E02 1080p")
+    FeedIngest(lambda url: body, store, push=lambda matches: []).run([("f", "x")])
+
+    # Feed unchanged (conditional GET): the stored, unpushed match is still retried
+    pushed = []
+    FeedIngest(lambda url: None, store, push=lambda matches: pushed.extend(matches) or matches).run([("f", "x")])
+    assert [i.title for _, i in pushed] == ["Show S01E02 1080p"]
+    assert store.unpushed([item("Show S01E02 1080p")]) == []
+
+    # Once pushed it is not offered again, even while still on the feed
+    pushed.clear()
+    FeedIngest(lambda url: body, store, push=lambda matches: pushed.extend(matches) or matches).run([("f", "x")])
+    assert pushed == []
+
+
+def test_unpushed_handles_more_keys_than_sqlite_variables(tmp_path, monkeypatch):
+    store = ItemStore(str(tmp_path / "items.db"))
+    if hasattr(sqlite3, "SQLITE_LIMIT_VARIABLE_NUMBER"):  # Python 3.11+
+        connect = store.connect
+
+        def old_sqlite_limit():
+            conn = connect()
+            conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+            return conn
+        monkeypatch.setattr(store, "connect", old_sqlite_limit)
+    items = [FeedItem(f"Item {n}", "", "", f"{n:040x}", 0, 0, 0, "f", "") for n in range(2500)]
+    store.mark_pushed(items[::2])
+    assert store.unpushed(items) == items[1::2]
@@ -0,0 +1,19 @@
+import sqlite3
+
+from seen_store import SeenStore
+
+
+def test_unseen_handles_more_guids_than_sqlite_variables(tmp_path, monkeypatch):
+    store = SeenStore(tmp_path / "seen.db")
+    if hasattr(sqlite3, "SQLITE_LIMIT_VARIABLE_NUMBER"):  # Python 3.11+
+        connect = store.connect
+
+        def old_sqlite_limit():
+            conn = connect()
+            conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+            return conn
+        monkeypatch.setattr(store, "connect", old_sqlite_limit)
+
+    guids = [f"plex://movie/{n}" for n in range(2500)]
+    store.add(*guids[::2])
+    assert store.unseen(guids) == set(guids[1::2])
@@ -0,0 +1,20 @@
+import pytest
+
+import main
+
+
+def handler(path):
+    """BeyTVServer without a socket: only self.path is read by get_page_params"""
+    server = main.BeyTVServer.__new__(main.BeyTVServer)
+    server.path = path
+    return server
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/api/feeds?limit=20&offset=40", (20, 40)),
+    ("/api/feeds?limit=abc&offset=x", (50, 0)),
+    ("/api/feeds?limit=9999&offset=-5", (500, 0)),
+    ("/api/feeds", (50, 0)),
+])
+def test_page_params_fall_back_on_bad_values(path, expected):
+    assert handler(path).get_page_params() == expected